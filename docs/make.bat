@@ -9,6 +9,9 @@ if "%SPHINXBUILD%" == "" (
 )
 set SOURCEDIR=source
 set BUILDDIR=build
+REM Kept outside of BUILDDIR so cleaning the output keeps the pickled
+REM doctrees and the next build stays incremental
+set DOCTREEDIR=doctrees
 
 if "%1" == "" goto help
 
@@ -25,7 +28,7 @@ if errorlevel 9009 (
 	exit /b 1
 )
 
-%SPHINXBUILD% -M %1 %SOURCEDIR% %BUILDDIR% %SPHINXOPTS% %O%
+%SPHINXBUILD% -M %1 %SOURCEDIR% %BUILDDIR% -d %DOCTREEDIR% %SPHINXOPTS% %O%
 goto end
 
 :help
@@ -10,7 +10,9 @@
 # add these directories to sys.path here. If the directory is relative to the
 # documentation root, use os.path.abspath to make it absolute, like shown here.
 #
+import ast
 import os
+import re
 import sys
 sys.path.insert(0, os.path.abspath('../../mock_pal/'))
 sys.path.insert(0, os.path.abspath('../../mm_pal/'))
@@ -28,17 +30,24 @@ def get_version():
     Importing cause issues with coverage,
         (modules can be removed from sys.modules to prevent this)
     Importing __init__.py triggers importing rest and then requests too
-    Inspired from pep8 setup.py
+    The module is parsed with ast so nothing gets evaluated
     """
     with open(os.path.join('../../mm_pal', '__init__.py')) as init_fd:
-        for line in init_fd:
-            if line.startswith('__version__'):
-                return eval(line.split('=')[-1])
-    return None
+        tree = ast.parse(init_fd.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == '__version__'
+                for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError("__version__ not found in mm_pal/__init__.py")
 
 
 # The full version, including alpha/beta/rc tags
 release = get_version()
+# Drop dev and local suffixes so every commit does not invalidate the whole
+# doctree cache, use ``sphinx-build -E`` to force a full rebuild
+version = re.sub(r'(\.dev\d+)?(\+.*)?$', '', release)
+release = version
 
 master_doc = 'index'
 
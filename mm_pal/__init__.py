@@ -5,11 +5,16 @@
 # SPDX-License-Identifier:    MIT
 """package init for mm_pal.
 
-Exposes useful modules.
+Exposes useful modules. They are imported on first access so reading
+``__version__`` does not pull in ``serial`` or ``cmd2``.
 """
-from .mm_if import MmIf, import_mm_from_csv
-from .mm_cmd import MmCmd
-from .misc import serial_connect_wizard
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .mm_if import MmIf, import_mm_from_csv
+    from .mm_cmd import MmCmd
+    from .misc import serial_connect_wizard
 
 __author__ = "Kevin Weiss"
 __email__ = "kevin.weiss@gmail.com"
@@ -19,3 +24,29 @@ __all__ = ['MmIf',
            'MmCmd',
            'import_mm_from_csv',
            'serial_connect_wizard']
+
+_LAZY_ATTRS = {'MmIf': '.mm_if',
+               'import_mm_from_csv': '.mm_if',
+               'MmCmd': '.mm_cmd',
+               'serial_connect_wizard': '.misc'}
+
+
+def __getattr__(name):
+    """Import public attributes on first access."""
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    try:
+        # Submodules such as mm_pal.mm_if stay reachable as attributes
+        return importlib.import_module(f".{name}", __name__)
+    except ModuleNotFoundError as exc:
+        if exc.name != f"{__name__}.{name}":
+            raise
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """List lazily imported attributes as well."""
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -0,0 +1,54 @@
+# Copyright (c) 2020 HAW Hamburg
+#
+# This file is subject to the terms and conditions of the MIT License. See the
+# file LICENSE in the top level directory for more details.
+# SPDX-License-Identifier:    MIT
+r"""Fast serial port listing.
+
+On Windows ``serial.tools.list_ports.comports()`` queries every PnP entity
+which can take a long time. The names of the serial ports are also available
+in the ``HARDWARE\DEVICEMAP\SERIALCOMM`` registry key, reading that is much
+faster. The registry does not know the USB VID and PID of a port, when those
+are needed or on other platforms the pyserial implementation is used.
+"""
+import sys
+
+
+def _comports_from_registry():
+    # pylint: disable=import-outside-toplevel,import-error
+    import winreg
+    from serial.tools.list_ports_common import ListPortInfo
+
+    ports = []
+    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE,
+                        r"HARDWARE\DEVICEMAP\SERIALCOMM") as key:
+        for index in range(winreg.QueryInfoKey(key)[1]):
+            name, device, _ = winreg.EnumValue(key, index)
+            info = ListPortInfo(device, skip_link_detection=True)
+            info.description = name
+            ports.append(info)
+    return ports
+
+
+def comports(hardware_info=False):
+    """Return a list of available serial ports.
+
+    Args:
+        hardware_info (bool): Fill in USB information such as ``vid`` and
+            ``pid``, this skips the fast listing on Windows, defaults to
+            False.
+
+    Returns:
+        list: ``ListPortInfo`` entries that can be indexed like
+        ``(device, description, hwid)`` tuples.
+    """
+    if sys.platform == "win32" and not hardware_info:
+        try:
+            return _comports_from_registry()
+        except (ImportError, OSError, TypeError):
+            # TypeError: pyserial before 3.5 lacks skip_link_detection
+            pass
+    # Imported here, pyserial's platform port listing is slow to import
+    # pylint: disable=import-outside-toplevel
+    from serial.tools import list_ports
+    return list_ports.comports()
@@ -0,0 +1,295 @@
+# Copyright (c) 2020 HAW Hamburg
+# This file is subject to the terms and conditions of the MIT License. See the
+# file LICENSE in the top level directory for more details.
+# SPDX-License-Identifier:    MIT
+"""Parsing and packing helpers for mm_if.
+
+Converts between memory map values, device bytes and the text of the json
+protocol. These do not depend on a device so they are kept apart from the
+interface classes.
+"""
+import csv
+import errno
+import importlib
+import operator
+import os
+from ast import literal_eval
+from functools import lru_cache, partial
+from struct import Struct, error as StructError
+
+
+def _unsigned_cast(bits):
+    mask = (1 << bits) - 1
+    return lambda num: num & mask
+
+
+def _signed_cast(bits):
+    mask = (1 << bits) - 1
+    sign = 1 << (bits - 1)
+    return lambda num: ((num & mask) ^ sign) - sign
+
+
+# Truncate and sign extend like the C types, without ctypes objects
+_C_CASTS = {"uint8_t": _unsigned_cast(8),
+            "int8_t": _signed_cast(8),
+            "uint16_t": _unsigned_cast(16),
+            "int16_t": _signed_cast(16),
+            "uint32_t": _unsigned_cast(32),
+            "int32_t": _signed_cast(32)}
+
+# struct format character and size of each C type
+_STRUCT_CODES = {"uint8_t": ("B", 1),
+                 "int8_t": ("b", 1),
+                 "uint16_t": ("H", 2),
+                 "int16_t": ("h", 2),
+                 "uint32_t": ("I", 4),
+                 "int32_t": ("i", 4)}
+
+# Arrays of at least this many elements are parsed with numpy if installed,
+# below that the cached Struct is as fast or faster
+_NP_MIN_ELEMENTS = 4096
+_NP_DTYPES = {"uint8_t": "<u1",
+              "int8_t": "<i1",
+              "uint16_t": "<u2",
+              "int16_t": "<i2",
+              "uint32_t": "<u4",
+              "int32_t": "<i4"}
+
+# Text of every byte value for building write commands
+_BYTE_TEXT = tuple(str(byte) for byte in range(256))
+
+
+@lru_cache(maxsize=128)
+def _array_struct(prim_type, elements):
+    """Return a compiled little endian Struct for an array."""
+    return Struct(f"<{elements}{_STRUCT_CODES[prim_type][0]}")
+
+
+@lru_cache(maxsize=None)
+def _optional_module(name):
+    """Return an optional module such as numpy, None if it is not installed.
+
+    These are slow to import, so they are only imported on first use.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+async def _run_blocking(func, *args, **kwargs):
+    """Run a blocking call in the default executor of the running loop."""
+    # Only coroutine users pay for importing asyncio
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+@lru_cache(maxsize=256)
+def _error_text(error_code):
+    """Return the message of an errno based device error."""
+    # Devices repeat the same few errors, especially while retrying
+    if error_code not in errno.errorcode:
+        return f"Unknown Error[{error_code}]"
+    s_errcode = errno.errorcode[error_code]
+    s_errmsg = os.strerror(error_code)
+    return f"{s_errcode}-{s_errmsg} [{error_code}]"
+
+
+def _loads_obj(buf):
+    """Decode buf with orjson if it holds a single object, None otherwise."""
+    orjson = _optional_module("orjson")
+    if orjson is None:
+        return None
+    try:
+        obj = orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _merge_spans(spans, gap):
+    """Group sorted ``(start, end, ...)`` spans that are at most gap apart.
+
+    Returns:
+        list: ``[start, end, spans]`` for each group.
+    """
+    runs = []
+    for span in spans:
+        if runs and span[0] <= runs[-1][1] + gap:
+            runs[-1][1] = max(runs[-1][1], span[1])
+            runs[-1][2].append(span)
+        else:
+            runs.append([span[0], span[1], [span]])
+    return runs
+
+
+def _wr_cmd(index, data):
+    """Return the ``wr`` command writing ``data`` at ``index``."""
+    if isinstance(data, (bytes, bytearray)):
+        wbytes = " ".join([_BYTE_TEXT[byte] for byte in data])
+    else:
+        wbytes = " ".join(map(str, data))
+    return f"wr {index} {wbytes}"
+
+
+@lru_cache(maxsize=256)
+def _bit_field(bits, bit_offset):
+    """Return the int bit offset and mask of a bitfield register."""
+    return int(bit_offset), (1 << int(bits)) - 1
+
+
+def _eval_write_value(val):
+    # Only text such as shell arguments needs to be evaluated, integer
+    # types such as numpy.int64 become a plain int
+    if isinstance(val, str):
+        return literal_eval(val)
+    try:
+        return operator.index(val)
+    except TypeError:
+        return val
+
+
+def _parse_csv_value(val):
+    # Most cells are plain numbers or names, only the rest need the much
+    # slower literal_eval, the result is the same as literal_eval
+    try:
+        return int(val, 0)
+    except ValueError:
+        pass
+    num = val.lstrip('+-')
+    # Digits only that int() rejects have leading zeros, literal_eval
+    # rejects those too
+    if (num[:1].isdigit() or num[:1] == '.') and not num.isdigit():
+        try:
+            return float(val)
+        except ValueError:
+            pass
+    if not val or (val.isidentifier() and
+                   val not in ('True', 'False', 'None')):
+        return val
+    try:
+        return literal_eval(val)
+    except (ValueError, TypeError, SyntaxError, MemoryError,
+            RecursionError):
+        return val
+
+
+def _try_parse_int_list(list_int):
+    for i, val in enumerate(list_int):
+        list_int[i] = _parse_csv_value(str(val))
+
+
+def _parse_mm_csv(path):
+    """Parse a memory map csv file to a dict keyed by register name."""
+    mem_map = {}
+    with open(path, encoding='utf-8', newline='') as csvfile:
+        # Rows are handled as they are read, the header is looked at once.
+        # DictReader is not used as it gives an OrderedDict on python 3.7.
+        reader = csv.reader(csvfile, quotechar="'")
+        header = next(reader, [])
+        for row in reader:
+            _try_parse_int_list(row)
+            cmd = dict(zip(header, row))
+            mem_map[cmd['name']] = cmd
+    return mem_map
+
+
+def _c_cast(num, prim_type):
+    """Truncate and sign extend num like the C type prim_type."""
+    cast = _C_CASTS.get(prim_type)
+    if cast is None:
+        return num
+    return cast(num)
+
+
+def _parse_array_numpy(data, type_size, prim_type):
+    """Parse a large array with numpy, None if it cannot be used."""
+    if (prim_type not in _NP_DTYPES or
+            len(data) < _NP_MIN_ELEMENTS * type_size or
+            len(data) % type_size):
+        return None
+    numpy = _optional_module("numpy")
+    if numpy is None:
+        return None
+    try:
+        return numpy.frombuffer(bytes(data),
+                                dtype=_NP_DTYPES[prim_type]).tolist()
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_array(data, type_size, prim_type):
+    """Parse little endian device bytes to a list of prim_type values."""
+    parsed_data = _parse_array_numpy(data, type_size, prim_type)
+    if parsed_data is not None:
+        return parsed_data
+    code = _STRUCT_CODES.get(prim_type)
+    if code is not None and code[1] == type_size:
+        try:
+            # Json responses give the bytes as a list of numbers
+            buf = bytes(data)
+        except (ValueError, TypeError):
+            return data
+        elements = len(buf) // type_size
+        return list(_array_struct(prim_type, elements).unpack_from(buf))
+    try:
+        elements = int(len(data)/type_size)
+        parsed_data = [int.from_bytes(data[i*type_size:(i+1)*type_size],
+                                      byteorder='little')
+                       for i in range(0, elements)]
+    except (ValueError, TypeError):
+        return data
+    cast = _C_CASTS.get(prim_type)
+    if cast is not None:
+        parsed_data = [cast(num) for num in parsed_data]
+    return parsed_data
+
+
+def _parse_resp_bit(reg_info, r_data):
+    """Return the value of a bitfield register from its read bytes."""
+    offset, bit_mask = _bit_field(reg_info['bits'], reg_info['bit_offset'])
+    data = int.from_bytes(r_data, byteorder='little')
+    data = data >> offset
+    return data & bit_mask
+
+
+def _parse_write_bit(cmd, w_data, r_data):
+    """Return the bytes of a register with a bitfield set to w_data."""
+    offset, bit_mask = _bit_field(cmd['bits'], cmd['bit_offset'])
+    if w_data > bit_mask:
+        raise ValueError(f"Writing value outside bitfield"
+                         f" {w_data} !<= {bit_mask}")
+    data = r_data & ~(bit_mask << offset)
+    data = (w_data << offset) | data
+    return data.to_bytes(cmd['type_size'], 'little')
+
+
+def _prep_write_data(data):
+    """Evaluate text write data, a single element list is its value."""
+    if isinstance(data, list):
+        if len(data) == 1:
+            data = data[0]
+    if isinstance(data, list):
+        data = [_eval_write_value(element) for element in data]
+    else:
+        data = _eval_write_value(data)
+    return data
+
+
+def _pack_reg_data(reg_info, data):
+    """Return the little endian bytes of an int or list for a register."""
+    signed = reg_info['type'].startswith('int')
+    type_size = reg_info['type_size']
+    if isinstance(data, int):
+        return data.to_bytes(type_size, "little", signed=signed)
+    codes = _STRUCT_CODES.get(reg_info['type'])
+    if codes is not None and codes[1] == type_size:
+        try:
+            return _array_struct(reg_info['type'], len(data)).pack(*data)
+        except StructError:
+            # Let to_bytes raise the usual error for values out of range
+            pass
+    return b"".join(element.to_bytes(type_size, "little", signed=signed)
+                    for element in data)
@@ -0,0 +1,84 @@
+# Copyright (c) 2020 HAW Hamburg
+# This file is subject to the terms and conditions of the MIT License. See the
+# file LICENSE in the top level directory for more details.
+# SPDX-License-Identifier:    MIT
+"""Write queue used by mm_if while batching register writes."""
+
+
+class _WriteQueue:
+    """Queued ``(offset, bytearray)`` writes, merged where possible."""
+
+    def __init__(self, writes=()):
+        """Start with the ``(offset, data)`` of writes, none by default."""
+        self.writes = []
+        for offset, data in writes:
+            self.add(offset, data)
+
+    def __bool__(self):
+        """Return True if there are writes to send."""
+        return bool(self.writes)
+
+    def __iter__(self):
+        """Iterate over the ``(offset, data)`` of the queued writes."""
+        return iter(self.writes)
+
+    def add(self, offset, data):
+        """Queue data to write at offset."""
+        if self.writes:
+            start, queued = self.writes[-1]
+            # Writes that continue the previous one are sent as one command
+            if start + len(queued) == offset:
+                queued.extend(data)
+                return
+            # Writes within the previous one, such as bitfields of the same
+            # register, replace its bytes
+            if start <= offset and offset + len(data) <= start + len(queued):
+                queued[offset - start:offset - start + len(data)] = data
+                return
+        self.writes.append((offset, bytearray(data)))
+
+    def covering(self, offset, size):
+        """Return queued bytes covering the whole range, None otherwise."""
+        for start, queued in reversed(self.writes):
+            end = start + len(queued)
+            if start <= offset and offset + size <= end:
+                return queued[offset - start:offset - start + size]
+            if start < offset + size and offset < end:
+                return None
+        return None
+
+    def overlay(self, offset, data):
+        """Return data read from offset with the queued writes applied."""
+        data = bytearray(data)
+        end = offset + len(data)
+        for start, queued in self.writes:
+            low, high = max(start, offset), min(start + len(queued), end)
+            if low < high:
+                data[low - offset:high - offset] = queued[low - start:
+                                                          high - start]
+        return data
+
+    def fragments(self, frag_size=None):
+        """Return ``(offset, data)`` of the writes split in frag_size bytes."""
+        frags = []
+        for offset, data in self.writes:
+            size = frag_size or len(data)
+            frags.extend((offset + cnt, data[cnt:cnt + size])
+                         for cnt in range(0, len(data), size))
+        return frags
+
+
+def _unacked_writes(group, acked):
+    """Return the writes of group that must be sent again, in order.
+
+    An acknowledged write that overlaps an earlier unacknowledged one is
+    also kept, so resending the earlier one does not overwrite it.
+    """
+    unacked = []
+    for num, (offset, data) in enumerate(group):
+        end = offset + len(data)
+        if (num >= len(acked) or not acked[num] or
+                any(u_off < end and offset < u_off + len(u_data)
+                    for u_off, u_data in unacked)):
+            unacked.append((offset, data))
+    return unacked
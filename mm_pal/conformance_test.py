@@ -1,11 +1,14 @@
 """A conformance test to ensure devices adhere to the the specifications."""
-from collections import ChainMap
+from collections import ChainMap, defaultdict
 from mm_pal.mm_if import MmIf
 
 
 class BaseConformanceSuite:
     """Base class for conformance tests."""
 
+    _INCONSISTENT_FLAGS = frozenset(("VOLATILE", "DEVICE_SPECIFIC"))
+    _flag_sets = None
+
     def target(self) -> MmIf:  # pragma: no cover
         """Target to test, overridden by device."""
         raise NotImplementedError
@@ -19,14 +22,14 @@ class BaseConformanceSuite:
 
     def test_read_struct(self, target: MmIf):
         """Read only structs."""
-        regs = {}
-        for key in target.mem_map.keys():
-            name = key.split('.')
-            if len(name) > 1:
-                if name[0] not in regs:
-                    regs[name[0]] = []
-                if not key.endswith('.res') and not key.endswith('.padding'):
-                    regs[name[0]].append(key)
+        regs = defaultdict(list)
+        for key in target.mem_map:
+            head, sep, _ = key.partition('.')
+            if sep:
+                # Structs with only reserved records are still read
+                reg_names = regs[head]
+                if not key.endswith(('.res', '.padding')):
+                    reg_names.append(key)
         for key, reg_names in regs.items():
             res = dict(ChainMap(*target.read_struct(key)))
 
@@ -47,9 +50,13 @@ class BaseConformanceSuite:
 
     def _consistent_reg(self, target: MmIf, reg_name):
         """Check if a register can be consistently read."""
-        flags = target.mem_map[reg_name].get('flag', "").split()
-        if "VOLATILE" in flags:
-            return False
-        if "DEVICE_SPECIFIC" in flags:
-            return False
-        return True
+        return not self._INCONSISTENT_FLAGS & self._reg_flags(target, reg_name)
+
+    def _reg_flags(self, target: MmIf, reg_name):
+        """Return the flags of a register, parsed once per memory map."""
+        mem_map = target.mem_map
+        if self._flag_sets is None or self._flag_sets[0] is not mem_map:
+            flag_sets = {key: frozenset(val.get('flag', "").split())
+                         for key, val in mem_map.items()}
+            self._flag_sets = (mem_map, flag_sets)
+        return self._flag_sets[1][reg_name]
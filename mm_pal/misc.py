@@ -4,16 +4,75 @@
 # file LICENSE in the top level directory for more details.
 # SPDX-License-Identifier:    MIT
 """Simple helpers that can be useful with mm_pal."""
-import serial.tools.list_ports
+import os
+import re
+import sys
+import threading
+import time
+from . import _list_ports_fast
 
 
-def serial_connect_wizard(if_obj, **kwargs):
+_CACHE_TTL = 3.0
+_PORT_CACHE = {"ts": 0.0, "ports": None, "hardware_info": False}
+_PORT_CACHE_LOCK = threading.Lock()
+# Skip bluetooth and built in modem ttys, they stall when probed. Only whole
+# known names match, USB CDC-ACM boards such as cu.usbmodem1421 are kept.
+_PORT_EXCLUDE_RE = re.compile(r"^(?:(?:cu|tty)\.(?:Bluetooth|BLTH)"
+                              r"|rfcomm\d+$"
+                              r"|(?:cu|tty)\.modem\d*$)")
+
+
+def _cached_comports(use_cache=True, hardware_info=False):
+    """Return sorted serial ports, reusing a recent enumeration.
+
+    Enumerating ports can be slow depending on the OS, so the result is
+    kept for ``_CACHE_TTL`` seconds.
+    """
+    with _PORT_CACHE_LOCK:
+        now = time.monotonic()
+        if (not use_cache or _PORT_CACHE["ports"] is None or
+                now - _PORT_CACHE["ts"] >= _CACHE_TTL or
+                (hardware_info and not _PORT_CACHE["hardware_info"])):
+            _PORT_CACHE["ports"] = sorted(
+                _list_ports_fast.comports(hardware_info))
+            _PORT_CACHE["ts"] = now
+            _PORT_CACHE["hardware_info"] = hardware_info
+        return list(_PORT_CACHE["ports"])
+
+
+def _prioritize_ports(serial_devices, vid_pid):
+    """Move ports matching a ``(vid, pid)`` pair to the front."""
+    vid_pid = set(vid_pid)
+    preferred = []
+    rest = []
+    for s_dev in serial_devices:
+        try:
+            match = (s_dev.vid, s_dev.pid) in vid_pid
+        except AttributeError:
+            match = False
+        if match:
+            preferred.append(s_dev)
+        else:
+            rest.append(s_dev)
+    return preferred + rest
+
+
+def serial_connect_wizard(if_obj, *, use_cache=True, vid_pid=None,
+                          port_filter=None, **kwargs):
     """Console based wizard to help connect to a serial port.
 
     Args:
         if_obj (obj): Interface class to instantiate.
+        use_cache (bool): Reuse the serial ports found within the last few
+            seconds instead of enumerating them again, defaults to True.
+        vid_pid (iterable, optional): ``(vid, pid)`` pairs of known devices,
+            matching ports are listed first, defaults to None.
+        port_filter (str, obj, optional): Regular expression the port name
+            must match to be listed, defaults to None which lists all ports
+            except bluetooth and modem ones.
         **kwargs: Keyword args to pass to the instantation of the if_obj.
-            ``port`` keyword is overwritten with selected serial port.
+            If ``port`` is given it is used without looking for serial
+            ports, otherwise it is set to the selected serial port.
 
     Return:
         (obj): Instantiated if_obj.
@@ -21,7 +80,20 @@ def serial_connect_wizard(if_obj, **kwargs):
     Raises:
         ConnectionError: No connections available.
     """
-    serial_devices = sorted(serial.tools.list_ports.comports())
+    if kwargs.get('port'):
+        return if_obj(**kwargs)
+    # The fast Windows listing has no vid and pid to prioritize with
+    ports = _cached_comports(use_cache, hardware_info=bool(vid_pid))
+    if port_filter is None:
+        serial_devices = [s_dev for s_dev in ports
+                          if not _PORT_EXCLUDE_RE.search(
+                              os.path.basename(s_dev[0]))]
+    else:
+        port_re = re.compile(port_filter)
+        serial_devices = [s_dev for s_dev in ports
+                          if port_re.search(os.path.basename(s_dev[0]))]
+    if vid_pid:
+        serial_devices = _prioritize_ports(serial_devices, vid_pid)
     if len(serial_devices) == 0:
         raise ConnectionError("Could not find any available devices")
     if len(serial_devices) == 1:
@@ -29,16 +101,17 @@ def serial_connect_wizard(if_obj, **kwargs):
         kwargs['port'] = serial_devices[0][0]
         return if_obj(**kwargs)
 
-    print('Select a serial port:')
-    max_num = 0
-    for i, s_dev in enumerate(serial_devices):
-        print(f"{i}: {s_dev}")
-        max_num = i
+    # Write the listing at once, printing each line flushes on a tty
+    listing = "".join(f"{i}: {s_dev}\n"
+                      for i, s_dev in enumerate(serial_devices))
+    sys.stdout.write(f"Select a serial port:\n{listing}")
+    sys.stdout.flush()
+    valid = range(len(serial_devices))
     s_num = -1
-    while s_num < 0 or max_num < s_num:
+    while s_num not in valid:
         try:
             s_num = int(input("Selection(number): "))
         except ValueError:
             print("Invalid selection!")
-    kwargs['port'] = serial_devices[int(s_num)][0]
+    kwargs['port'] = serial_devices[s_num][0]
     return if_obj(**kwargs)
@@ -26,10 +26,11 @@ A basic example of how to integrate this into code is the following:
 
 """
 import argparse
+import bisect
 import logging
 import os
-from pprint import pformat
-from typing import List
+from pprint import PrettyPrinter
+from typing import List, Tuple
 from cmd2 import Cmd, with_argparser, Settable
 
 
@@ -41,6 +42,16 @@ def add_timeout_retry_arguments(arg_parser):
                             help="Amount of times to retry the command")
 
 
+# Shared printers, pformat would build a new PrettyPrinter for every call
+_PRETTY = PrettyPrinter()
+_PRETTY_COMPACT = PrettyPrinter(compact=True)
+_LOG_LEVELS = ('NOTSET', 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Parent parser so the common arguments are only built once
+_TIMEOUT_RETRY = argparse.ArgumentParser(add_help=False)
+add_timeout_retry_arguments(_TIMEOUT_RETRY)
+
+
 class MmCmd(Cmd):
     """Cmd wrapper for mm_pal based devices.
 
@@ -51,6 +62,8 @@ class MmCmd(Cmd):
             device.
     """
 
+    _class_logger = None
+
     def __init__(self, dev_driver, *args, **kwargs):
         """Instantiate cmd based cli class.
 
@@ -60,36 +73,99 @@ class MmCmd(Cmd):
             persistent_history_file (str): Path to history file,
                 defaults to ~/.mm_history.
         """
-        self.logger = self.logger = logging.getLogger(self.__class__.__name__)
+        cls = type(self)
+        # Look up the logger once per class, not for every instance
+        if cls.__dict__.get('_class_logger') is None:
+            cls._class_logger = logging.getLogger(cls.__name__)
+        self.logger = cls._class_logger
         self.dev_driver = dev_driver
+        self._mm_cache = None
         phf = 'persistent_history_file'
         kwargs[phf] = kwargs.pop(phf, os.path.join(os.path.expanduser("~"),
                                                    ".mm_history"))
         super().__init__(allow_cli_args=False, *args, **kwargs)
         self.loglevel = logging.getLevelName(logging.root.level)
         settable = Settable('loglevel', str, 'Logging Level', self,
-                            choices=['NOTSET', 'DEBUG', 'INFO',
-                                     'WARNING', 'ERROR', 'CRITICAL'],
+                            choices=_LOG_LEVELS,
                             onchange_cb=self._onchange_loglevel)
         self.add_settable(settable)
 
-    def regs_choices_method(self) -> List[str]:
+    def invalidate_choices_cache(self):
+        """Clear the cached completion choices.
+
+        A new ``mem_map`` assigned to the ``dev_driver`` is detected, only
+        call this after changing the current ``mem_map`` in place.
+        """
+        self._mm_cache = None
+
+    def _mm_cached(self):
+        """Return the cached values of the current memory map."""
+        mem_map = self.dev_driver.mem_map
+        if self._mm_cache is None or self._mm_cache[0] is not mem_map:
+            self._mm_cache = (mem_map, {})
+        return self._mm_cache[1]
+
+    def regs_choices_method(self) -> Tuple[str, ...]:
         """Return a list of valid register names."""
-        return list(self.dev_driver.mem_map.keys())
+        cache = self._mm_cached()
+        if 'regs' not in cache:
+            cache['regs'] = tuple(self.dev_driver.mem_map)
+        return cache['regs']
 
-    def param_choices_method(self) -> List[str]:
+    def param_choices_method(self) -> Tuple[str, ...]:
         """Return a list of parameters of memory map."""
-        first_reg = list(self.dev_driver.mem_map.keys())[0]
-        return list(self.dev_driver.mem_map[first_reg].keys())
+        cache = self._mm_cached()
+        if 'params' not in cache:
+            first_reg = next(iter(self.dev_driver.mem_map))
+            cache['params'] = tuple(self.dev_driver.mem_map[first_reg])
+        return cache['params']
+
+    @staticmethod
+    def _complete_prefix(choices, text) -> List[str]:
+        """Return the sorted ``choices`` that start with ``text``."""
+        idx = bisect.bisect_left(choices, text)
+        matches = []
+        while idx < len(choices) and choices[idx].startswith(text):
+            matches.append(choices[idx])
+            idx += 1
+        return matches
 
-    read_reg_parser = argparse.ArgumentParser()
-    read_reg_parser.add_argument('reg', choices_provider=regs_choices_method,
+    # pylint: disable=unused-argument
+    def _complete_map(self, text, line, begidx, endidx) -> List[str]:
+        """Complete register names, reserved records are skipped."""
+        cache = self._mm_cached()
+        if 'keys' not in cache:
+            cache['keys'] = tuple(sorted(
+                key for key in self.regs_choices_method()
+                if not key.endswith('.res')))
+        return self._complete_prefix(cache['keys'], text)
+
+    def _complete_struct(self, text, line, begidx, endidx) -> List[str]:
+        """Complete struct names one dotted level at a time.
+
+        ``st`` completes to ``stt`` and ``stt.`` to the registers and
+        nested structs of ``stt``, such as ``stt.bf16``.
+        """
+        cache = self._mm_cached()
+        if 'structs' not in cache:
+            prefixes = set()
+            for key in self.regs_choices_method():
+                if key.endswith('.res'):
+                    continue
+                parts = key.split('.')
+                prefixes.update('.'.join(parts[:idx])
+                                for idx in range(1, len(parts) + 1))
+            cache['structs'] = tuple(sorted(prefixes))
+        return [name for name in self._complete_prefix(cache['structs'], text)
+                if '.' not in name[len(text):]]
+
+    read_reg_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
+    read_reg_parser.add_argument('reg', completer=_complete_map,
                                  help="name of the register to read")
     read_reg_parser.add_argument('--offset', '-o', type=int, default=0,
                                  help="offset of the array")
     read_reg_parser.add_argument('--size', '-s', type=int,
                                  help="number of elements to read in array")
-    add_timeout_retry_arguments(read_reg_parser)
 
     @with_argparser(read_reg_parser)
     def do_read_reg(self, opts):
@@ -101,8 +177,23 @@ class MmCmd(Cmd):
                                         retry=opts.retry)
         self.poutput(resp)
 
-    write_reg_parser = argparse.ArgumentParser()
-    write_reg_parser.add_argument('reg', choices_provider=regs_choices_method,
+    read_regs_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
+    read_regs_parser.add_argument('regs', nargs="+", completer=_complete_map,
+                                  help="names of the registers to read")
+
+    @with_argparser(read_regs_parser)
+    def do_read_regs(self, opts):
+        """Read registers, neighbouring registers are read together."""
+        resp = self.dev_driver.read_regs(opts.regs,
+                                         timeout=opts.timeout,
+                                         retry=opts.retry)
+        # One line per register in the order they were asked for, pformat
+        # would sort them by name
+        for reg, val in resp.items():
+            self.poutput(f'{reg}: {val}')
+
+    write_reg_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
+    write_reg_parser.add_argument('reg', completer=_complete_map,
                                   help="name of the register to read")
     write_reg_parser.add_argument('data', nargs="+",
                                   help="Data to write")
@@ -110,7 +201,6 @@ class MmCmd(Cmd):
                                   help="offset of the array")
     write_reg_parser.add_argument('--verify', '-v', action="store_true",
                                   help="Verify the data was written")
-    add_timeout_retry_arguments(write_reg_parser)
 
     @with_argparser(write_reg_parser)
     def do_write_reg(self, opts):
@@ -122,9 +212,9 @@ class MmCmd(Cmd):
                                   retry=opts.retry)
         self.poutput("Success")
 
-    commit_write_parser = argparse.ArgumentParser()
+    commit_write_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
     commit_write_parser.add_argument('reg',
-                                     choices_provider=regs_choices_method,
+                                     completer=_complete_map,
                                      help="name of the register to read")
     commit_write_parser.add_argument('data', nargs="+",
                                      help="Data to write")
@@ -132,7 +222,6 @@ class MmCmd(Cmd):
                                      help="offset of the array")
     commit_write_parser.add_argument('--verify', '-v', action="store_true",
                                      help="Verify the data was written")
-    add_timeout_retry_arguments(commit_write_parser)
 
     @with_argparser(commit_write_parser)
     def do_commit_write(self, opts):
@@ -144,9 +233,9 @@ class MmCmd(Cmd):
                                      retry=opts.retry)
         self.poutput("Success")
 
-    read_struct_parser = argparse.ArgumentParser()
+    read_struct_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
     read_struct_parser.add_argument('struct', default='.', nargs='?',
-                                    choices_provider=regs_choices_method,
+                                    completer=_complete_struct,
                                     help="Name of the struct to read"
                                     ", use \".\" for all")
     read_struct_parser.add_argument('--data_only', '-d',
@@ -155,7 +244,6 @@ class MmCmd(Cmd):
     read_struct_parser.add_argument('--compact', '-c',
                                     action="store_true",
                                     help="Output is compact")
-    add_timeout_retry_arguments(read_struct_parser)
 
     @with_argparser(read_struct_parser)
     def do_read_struct(self, opts):
@@ -164,10 +252,10 @@ class MmCmd(Cmd):
                                            data_has_name=opts.data_only,
                                            timeout=opts.timeout,
                                            retry=opts.retry)
-        self.poutput(pformat(resp, compact=opts.compact))
+        printer = _PRETTY_COMPACT if opts.compact else _PRETTY
+        self.poutput(printer.pformat(resp))
 
-    commit_parser = argparse.ArgumentParser()
-    add_timeout_retry_arguments(commit_parser)
+    commit_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
 
     @with_argparser(commit_parser)
     def do_commit(self, opts):
@@ -175,8 +263,25 @@ class MmCmd(Cmd):
         self.dev_driver.commit(timeout=opts.timeout, retry=opts.retry)
         self.poutput("Success")
 
-    soft_reset_parser = argparse.ArgumentParser()
-    add_timeout_retry_arguments(soft_reset_parser)
+    def do_begin_batch(self, _):
+        """Queue the following writes until commit_batch is called."""
+        self.dev_driver.begin_batch()
+        self.poutput("Success")
+
+    commit_batch_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
+
+    @with_argparser(commit_batch_parser)
+    def do_commit_batch(self, opts):
+        """Send the writes queued since begin_batch."""
+        self.dev_driver.commit_batch(timeout=opts.timeout, retry=opts.retry)
+        self.poutput("Success")
+
+    def do_discard_batch(self, _):
+        """Drop the writes queued since begin_batch without sending them."""
+        self.dev_driver.discard_batch()
+        self.poutput("Success")
+
+    soft_reset_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
 
     @with_argparser(soft_reset_parser)
     def do_soft_reset(self, opts):
@@ -184,8 +289,7 @@ class MmCmd(Cmd):
         self.dev_driver.soft_reset(timeout=opts.timeout, retry=opts.retry)
         self.poutput("Success")
 
-    version_parser = argparse.ArgumentParser()
-    add_timeout_retry_arguments(version_parser)
+    version_parser = argparse.ArgumentParser(parents=[_TIMEOUT_RETRY])
 
     @with_argparser(version_parser)
     def do_get_version(self, opts):
@@ -197,7 +301,7 @@ class MmCmd(Cmd):
         self.poutput(f'Interface version: {version}')
 
     info_reg_parser = argparse.ArgumentParser()
-    info_reg_parser.add_argument('reg', choices_provider=regs_choices_method,
+    info_reg_parser.add_argument('reg', completer=_complete_map,
                                  nargs=(0, 1),
                                  help="name of the register to read")
 
@@ -223,10 +327,21 @@ class MmCmd(Cmd):
                 "type_size": 1
             }
         """
-        if opts.reg:
-            self.poutput(pformat(self.dev_driver.mem_map[opts.reg]))
-        else:
-            self.poutput(pformat(self.dev_driver.mem_map))
+        self.poutput(self._info_reg_text(opts.reg))
+
+    def _info_reg_text(self, reg=None):
+        """Return the formatted info of a register or the whole memory map.
+
+        The formatted text is kept for as long as the memory map is used.
+        """
+        info_cache = self._mm_cached().setdefault('info', {})
+        if reg not in info_cache:
+            if reg:
+                text = _PRETTY.pformat(self.dev_driver.mem_map[reg])
+            else:
+                text = _PRETTY.pformat(self.dev_driver.mem_map)
+            info_cache[reg] = text
+        return info_cache[reg]
 
     info_param_parser = argparse.ArgumentParser()
     info_param_parser.add_argument('param',
@@ -236,11 +351,22 @@ class MmCmd(Cmd):
     @with_argparser(info_param_parser)
     def do_info_param(self, opts):
         """Print selected parameter of all registers."""
-        record_types = {}
-        for key, val in self.dev_driver.mem_map.items():
-            if opts.param in val:
-                record_types[key] = val[opts.param]
-        self.poutput(pformat(record_types))
+        self.poutput(_PRETTY.pformat(self._param_records(opts.param)))
+
+    def _param_records(self, param):
+        """Return the value of a parameter for each register.
+
+        An index of all parameters is built the first time so each lookup
+        does not need to scan the memory map.
+        """
+        cache = self._mm_cached()
+        if 'param_index' not in cache:
+            param_index = {}
+            for key, val in self.dev_driver.mem_map.items():
+                for p_name, p_val in val.items():
+                    param_index.setdefault(p_name, {})[key] = p_val
+            cache['param_index'] = param_index
+        return cache['param_index'].get(param, {})
 
     # pylint: disable=unused-argument
     def _onchange_loglevel(self, param_name, old, new):
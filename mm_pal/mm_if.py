@@ -15,14 +15,17 @@ Generation of a memory map can be done with the
 `Memory Map Manager <https://github.com/riot-appstore/memory_map_manager>`_
 tool.
 """
+import bisect
 import logging
-import errno
 import os
-import json
-import csv
-from ctypes import c_uint8, c_uint16, c_uint32, c_int8, c_int16, c_int32
-from ast import literal_eval
+import threading
+from copy import deepcopy
 from .serial_driver import SerialDriver
+from .mm_json_parser import MmJsonParser
+from ._mm_utils import (_c_cast, _merge_spans, _pack_reg_data, _parse_array,
+                        _parse_array_numpy, _parse_mm_csv, _parse_resp_bit,
+                        _parse_write_bit, _prep_write_data, _run_blocking)
+from ._write_batch import _WriteQueue, _unacked_writes
 
 
 __author__ = "Kevin Weiss"
@@ -32,12 +35,8 @@ __email__ = "weiss.kevin604@gmail.com"
 MM_IF_EXCEPTIONS = IOError, ValueError, KeyError, TimeoutError, RuntimeError
 
 
-def _try_parse_int_list(list_int):
-    for i, val in enumerate(list_int):
-        try:
-            list_int[i] = literal_eval(str(val))
-        except (ValueError, TypeError, SyntaxError):
-            pass
+# Parsed memory maps by absolute path, with the mtime they were parsed at
+_MM_CACHE = {}
 
 
 def import_mm_from_csv(path):
@@ -51,186 +50,94 @@ def import_mm_from_csv(path):
         path (str): Path to the csv containing the memory map.
     Returns:
         obj: memory map from the csv.
-    """
-    mem_map = {}
-    with open(path, encoding='utf-8') as csvfile:
-        rows = list(csv.reader(csvfile, quotechar="'"))
-        for row in range(1, len(rows)):
-            _try_parse_int_list(rows[row])
-            cmd = dict(zip(rows[0], rows[row]))
-            mem_map[rows[row][rows[0].index('name')]] = cmd
-    return mem_map
-
-
-class MmJsonParser:
-    """Json style parser for interfacing to memory map based devices.
-
-    Send command and parse response. Read lines
-    until json information contains a ``result``. Convert result to
-    ``RESULT_*`` type. Add `cmd` element with evaluated call.
-
-    Attributes:
-        driver (obj): Driver to send and receive information to parse.
-
-    Example:
-        send with driver
-        ``rr 0 3``
-
-        receive with driver
-        ``{"data":[0,1,2],"result":0}`` of type ``str``
 
-        return parsed data:
-        ::
-
-            [0, 1, 2]
+    Note:
+        The parsed file is cached until its modification time changes,
+        each call returns a new copy that can be modified.
     """
+    abspath = os.path.abspath(path)
+    mtime = os.stat(abspath).st_mtime_ns
+    cached = _MM_CACHE.get(abspath)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _parse_mm_csv(abspath))
+        _MM_CACHE[abspath] = cached
+    return deepcopy(cached[1])
 
-    def __init__(self, driver):
-        """Instantiate parser instance and start logger.
-
-        Args:
-            driver (obj): Driver to send and receive information to parse.
-        """
-        self.logger = logging.getLogger(self.__class__.__name__)
-        self.logger.debug("__init__(driver=%r)", driver)
-        self.driver = driver
-
-    def _error_msg(self, error_code):
-        self.logger.debug("_error_msg("
-                          "error_code=%r)", error_code)
-        if error_code not in errno.errorcode:
-            raise IOError(f"Unknown Error[{error_code}]")
-        s_errcode = errno.errorcode[error_code]
-        s_errmsg = os.strerror(error_code)
-        raise IOError(f"{s_errcode}-{s_errmsg} [{error_code}]")
-
-    def _send_cmd(self, cmd, timeout, end_key='result'):
-        self.logger.debug("_send_cmd("
-                          "cmd=%r, "
-                          "timeout=%r, "
-                          "end_key=%r)", cmd, timeout, end_key)
-        self.driver.writeline(cmd)
-        cmd_info = {}
-        while end_key not in cmd_info:
-            line = self.driver.readline(timeout)
-            try:
-                # We want to ignore non-json type messages
-                # this allows us to have debug messages in our command
-                cmd_info.update(json.loads(line))
-            except json.decoder.JSONDecodeError:
-                self.logger.warning("JSON parse error: line=%r", line)
-        return cmd_info
-
-    def send_and_parse_cmd(self, cmd, timeout=None):
-        """Return a dictionary with information from the event.
-
-        Args:
-            send_cmd (str): The command to write to the device.
-            to_byte_array (bool): If True and data is bytes leave it as an
-                array, defaults to False.
-            timeout (float): Optional override driver timeout for command,
-                defaults to None.
-        Returns:
-            dict: parsed json data
-        """
-        self.logger.debug("send_and_parse_cmd("
-                          "cmd=%r, "
-                          "timeout=%r)", cmd, timeout)
-        resp = self._send_cmd(cmd, timeout=timeout)
-
-        if resp['result'] == 0:
-            return resp
-        return self._error_msg(resp['result'])
-
-    def read_bytes(self, index, size=1, timeout=None):
-        """Read bytes from driver and parse the output.
-
-        Send the ``rr <index> <size>`` command to the driver.
-
-        Args:
-            index (int): Index of the memory map register.
-            size (int): Amount of bytes to read, defaults to 1.
-            timeout (float): Optional override driver timeout for command,
-                defaults to None.
 
-        Return:
-            list: bytes from device.
+class BoundReg:
+    """A register of a :class:`MmIf` resolved once for repeated access.
 
+    The register information, offset and size are looked up when binding so
+    polling the register does not repeat that work. Bind again after the
+    memory map of the interface changes.
+    """
 
-        """
-        self.logger.debug("read_bytes("
-                          "index=%r, "
-                          "size=%r, "
-                          "timeout=%r)", index, size, timeout)
-        return self.send_and_parse_cmd((f'rr {index} {size}'), timeout)['data']
+    __slots__ = ('mm_if', 'name', 'reg_info', 'offset', 'size')
 
-    def write_bytes(self, index, data, timeout=None):
-        """Write bytes in the register map.
+    def __init__(self, mm_if, name):
+        """Resolve the register ``name`` of ``mm_if``.
 
         Args:
-            index (int): Index of the memory map register.
-            data (list): Data to write, list of bytes.
-            timeout (float): Optional override driver timeout for command,
-                defaults to None.
+            mm_if (obj): Interface the register belongs to.
+            name (str): Name of the register.
 
         Exceptions:
-            IOError: Errno based error from device
-            TimeoutError: Device did not respond
+            KeyError: Register not in the memory map
         """
-        self.logger.debug("write_bytes(index=%r, "
-                          "data=%r, "
-                          "timeout=%r)", index, data, timeout)
-        wbytes = " ".join(map(str, data))
-        cmd = f"wr {index} {wbytes}"
-        self.send_and_parse_cmd(cmd, timeout=timeout)
-
-    def commit(self, timeout=None):
-        """Commit device configuration changes.
-
-        This will cause any changes in configuration to be applied. Call
-        after writing a register.
+        #: obj: Interface the register belongs to.
+        self.mm_if = mm_if
+        #: str: Name of the register.
+        self.name = name
+        #: dict: Memory map entry of the register.
+        self.reg_info = mm_if.mem_map[name]
+        # pylint: disable=protected-access
+        span = mm_if._reg_span(name)
+        #: int: Byte offset of the register.
+        self.offset = span[0]
+        #: int: Size of the register in bytes.
+        self.size = span[1]
+
+    def __repr__(self):
+        """Show the bound register name."""
+        return f"{self.__class__.__name__}({self.name!r})"
+
+    def read(self, offset=0, size=None, timeout=None, retry=None):
+        """Read the register, see :meth:`MmIf.read_reg`.
+
+        Reading the whole register uses the offset and size resolved when
+        binding.
 
         Args:
+            offset (int): The number of elements to offset in an array.
+            size (int): The number of elements to read in an array.
             timeout (float): Optional override driver timeout for command,
                 defaults to None.
+            retry (int): Optional override retry count, defaults to None.
 
-        Exceptions:
-            IOError: Errno based error from device
-            TimeoutError: Device did not respond
-        """
-        self.send_and_parse_cmd("ex", timeout=timeout)
-
-    def soft_reset(self, timeout=None):
-        """Send command to get the device to reset itself.
-
-        Args:
-            timeout (float): Optional override driver timeout for command,
-                defaults to None.
+        Returns:
+            int, list: Parsed response depending on register type.
 
         Exceptions:
             IOError: Errno based error from device
             TimeoutError: Device did not respond
+            ValueError: Argument incorrect
         """
-        self.logger.debug("soft_reset(timeout=%r", timeout)
-        self.send_and_parse_cmd("mcu_rst", timeout=timeout)
+        if offset != 0 or size is not None:
+            return self.mm_if.read_reg(self.name, offset=offset, size=size,
+                                       timeout=timeout, retry=retry)
+        # pylint: disable=protected-access
+        data = self.mm_if._read_bytes_with_parser(self.offset, self.size,
+                                                  retry, timeout)
+        return self.mm_if._parse_reg_data(self.reg_info, data)
 
-    def get_version(self, timeout=None):
-        """Get interface version from device.
+    def write(self, data, **kwargs):
+        """Write the register, see :meth:`MmIf.write_reg` for the kwargs.
 
         Args:
-            timeout (float): Optional override driver timeout for command,
-                defaults to None.
-
-        Returns:
-            str: version string
-
-        Exceptions:
-            IOError: Errno based error from device
-            TimeoutError: Device did not respond
+            data (list, int, str): The data to write to the register.
+            **kwargs: Keyword arguments passed to :meth:`MmIf.write_reg`.
         """
-        self.logger.debug("get_version(timeout=%r", timeout)
-        resp = self.send_and_parse_cmd("version", timeout=timeout)
-        return resp['version']
+        self.mm_if.write_reg(self.name, data, **kwargs)
 
 
 class MmIf:
@@ -238,7 +145,6 @@ class MmIf:
 
     Attributes:
         parser (obj): The type of parser to use, defaults to MmJsonParser.
-        mem_map (dict): Register memory mapping information.
     """
 
     def __init__(self, *args, **kwargs):
@@ -257,6 +163,19 @@ class MmIf:
                 call, defaults to 0.
             frag_size (int, optional): Max amount of single registers to access
                 in one command, defaults to None which has no limit.
+            frag_depth (int, optional): Amount of fragment reads to send
+                before waiting for the responses, defaults to 1. Drivers
+                whose ``writeline`` has no ``flush_input`` argument get one
+                command at a time.
+            max_read_gap (int, optional): When set, ``read_struct`` skips
+                reserved registers and gaps larger than this amount of bytes
+                instead of reading them, defaults to None which reads the
+                whole struct at once.
+            max_merge_gap (int, optional): ``read_regs`` reads registers
+                separated by up to this amount of bytes together, defaults
+                to 0 which only merges registers that touch.
+            hex_data (bool, optional): The device sends read data as a hex
+                string instead of a list of numbers, defaults to False.
             args: Variable arguments to pass to the driver.
             kwargs: Keyword arguments to pass to the driver.
 
@@ -266,10 +185,22 @@ class MmIf:
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.debug("__init__(args=%r, kwargs=%r)", args, kwargs)
 
+        self._mem_map = None
+        self._reg_spans = {}
+        self._struct_regs_cache = {}
+        self._struct_plans = {}
+        self._name_index = None
         driver_type = kwargs.pop('driver_type', 'serial')
         parser_type = kwargs.pop('parser_type', 'json')
         self.default_retry = kwargs.pop('default_retry', 0)
         self.frag_size = kwargs.pop('frag_size', None)
+        self.frag_depth = kwargs.pop('frag_depth', 1)
+        self.max_read_gap = kwargs.pop('max_read_gap', None)
+        self.max_merge_gap = kwargs.pop('max_merge_gap', 0)
+        hex_data = kwargs.pop('hex_data', False)
+        self._write_queue = None
+        # Reads from the async API flush the queue from executor threads
+        self._write_lock = threading.RLock()
         mm_path = kwargs.pop('mm_path', None)
         if mm_path is not None:
             mm_path = import_mm_from_csv(mm_path)
@@ -280,7 +211,33 @@ class MmIf:
         else:
             self._driver = self._driver_from_config(driver_type,
                                                     *args, **kwargs)
-        self.parser = self._parser_from_config(parser_type)
+        self.parser = self._parser_from_config(parser_type, hex_data)
+
+    @property
+    def mem_map(self):
+        """dict: Register memory mapping information.
+
+        Assign a new memory map instead of changing the registers in place,
+        register offsets, sizes and struct members are cached per memory
+        map.
+        """
+        return self._mem_map
+
+    @mem_map.setter
+    def mem_map(self, val):
+        self._mem_map = val
+        self._reg_spans = {}
+        self._struct_regs_cache = {}
+        self._struct_plans = {}
+        self._name_index = None
+
+    def _reg_span(self, reg):
+        """Return the cached offset and size of a whole register."""
+        span = self._reg_spans.get(reg)
+        if span is None:
+            span = self._get_off_size_reg(self.mem_map[reg], 0, None)
+            self._reg_spans[reg] = span
+        return span
 
     @property
     def driver(self):
@@ -313,12 +270,13 @@ class MmIf:
             return SerialDriver(*args, **kwargs)
         raise NotImplementedError()
 
-    def _parser_from_config(self, parser_type):
+    def _parser_from_config(self, parser_type, hex_data=False):
         """Return driver instance given configuration."""
         self.logger.debug("_parser_from_config("
-                          "driver_type=%r)", parser_type)
+                          "driver_type=%r, "
+                          "hex_data=%r)", parser_type, hex_data)
         if parser_type == 'json':
-            return MmJsonParser(self.driver)
+            return MmJsonParser(self.driver, hex_data=hex_data)
         raise NotImplementedError()
 
     def _retry_func(self, func, retry, *args, **kwargs):
@@ -356,6 +314,7 @@ class MmIf:
             TimeoutError: Device did not respond
         """
         self.logger.debug("commit(timeout=%r,retry=%r)", timeout, retry)
+        self._flush_writes(retry, timeout)
         self._retry_func(self.parser.commit, retry, timeout=timeout)
 
     def soft_reset(self, timeout=None, retry=None):
@@ -370,6 +329,7 @@ class MmIf:
             TimeoutError: Device did not respond
         """
         self.logger.debug("soft_reset(timeout=%r,retry=%r)", timeout, retry)
+        self._flush_writes(retry, timeout)
         self._retry_func(self.parser.soft_reset, retry, timeout=timeout)
 
     def get_version(self, timeout=None, retry=None):
@@ -391,43 +351,13 @@ class MmIf:
                                    timeout=timeout)
         return version
 
-    @staticmethod
-    def _c_cast(num, prim_type):
-        if prim_type == "uint8_t":
-            num = c_uint8(num).value
-        if prim_type == "int8_t":
-            num = c_int8(num).value
-        if prim_type == "uint16_t":
-            num = c_uint16(num).value
-        if prim_type == "int16_t":
-            num = c_int16(num).value
-        if prim_type == "uint32_t":
-            num = c_uint32(num).value
-        if prim_type == "int32_t":
-            num = c_int32(num).value
-        return num
-
-    @staticmethod
-    def _parse_array(data, type_size, prim_type):
-        parsed_data = []
-        try:
-            elements = int(len(data)/type_size)
-            for i in range(0, elements):
-                num = int.from_bytes(data[i*type_size:(i+1)*type_size],
-                                     byteorder='little')
-                parsed_data.append(MmIf._c_cast(num, prim_type))
-        except (ValueError, TypeError):
-            return data
-        return parsed_data
-
-    @staticmethod
-    def _parse_resp_bit(reg_info, r_data):
-        bits = int(reg_info['bits'])
-        offset = int(reg_info['bit_offset'])
-        bit_mask = (2 ** bits) - 1
-        data = int.from_bytes(r_data, byteorder='little')
-        data = data >> offset
-        return data & bit_mask
+    _c_cast = staticmethod(_c_cast)
+    _parse_array_numpy = staticmethod(_parse_array_numpy)
+    _parse_array = staticmethod(_parse_array)
+    _parse_resp_bit = staticmethod(_parse_resp_bit)
+    _parse_write_bit = staticmethod(_parse_write_bit)
+    _prep_write_data = staticmethod(_prep_write_data)
+    _unacked_writes = staticmethod(_unacked_writes)
 
     def _get_off_size_reg(self, reg_info, offset, size):
         self.logger.debug("_get_off_size_reg("
@@ -471,16 +401,44 @@ class MmIf:
                           "size=%r, "
                           "retry=%r, "
                           "timeout=%r)", offset, size, retry, timeout)
-        data = []
+        self._flush_writes(retry, timeout)
+        return self._read_device_bytes(offset, size, retry, timeout)
+
+    def _read_batched_bytes(self, offset, size, retry, timeout):
+        """Return the bytes as they are once the queued writes are sent.
+
+        Only the bytes asked for are read, the queued writes are not sent.
+        """
+        if self._write_queue is None:
+            return self._read_bytes_with_parser(offset, size, retry, timeout)
+        data = self._write_queue.covering(offset, size)
+        if data is None:
+            data = self._write_queue.overlay(
+                offset, self._read_device_bytes(offset, size, retry, timeout))
+        return data
+
+    def _read_device_bytes(self, offset, size, retry, timeout):
+        # Bytes are kept in a bytearray so int.from_bytes does not need to
+        # convert a list when parsing
+        data = bytearray()
 
         frag_size = self.frag_size or size
-        for byte_cnt in range(0, size, frag_size):
-            rbytes = self._retry_func(self.parser.read_bytes,
-                                      retry,
-                                      offset + byte_cnt,
-                                      min(size-byte_cnt, frag_size),
-                                      timeout=timeout)
-            data.extend(rbytes)
+        spans = [(offset + byte_cnt, min(size - byte_cnt, frag_size))
+                 for byte_cnt in range(0, size, frag_size)]
+        for idx in range(0, len(spans), self.frag_depth):
+            group = spans[idx:idx + self.frag_depth]
+            if len(group) == 1:
+                rbytes = self._retry_func(self.parser.read_bytes, retry,
+                                          *group[0], timeout=timeout)
+            else:
+                rbytes = self._retry_func(self.parser.read_bytes_pipelined,
+                                          retry, group, timeout=timeout)
+            try:
+                data.extend(rbytes)
+            except (TypeError, ValueError):
+                # Not bytes, keep what the device sent so it can be shown
+                data = list(data)
+                data.extend(rbytes)
         return data
 
     # pylint: disable=R0913
@@ -512,15 +470,88 @@ class MmIf:
                           "retry=%r)", reg, offset, size, timeout, retry)
         reg_info = self.mem_map[reg]
 
-        offset, size = self._get_off_size_reg(reg_info, offset, size)
+        if offset == 0 and size is None:
+            offset, size = self._reg_span(reg)
+        else:
+            offset, size = self._get_off_size_reg(reg_info, offset, size)
 
         data = self._read_bytes_with_parser(offset, size, retry, timeout)
+        return self._parse_reg_data(reg_info, data)
+
+    async def aread_reg(self, reg, **kwargs):
+        """Coroutine version of :meth:`read_reg`.
+
+        The read runs in the default executor so the event loop is not
+        blocked. Reads from several tasks are sent one after the other,
+        use :meth:`read_regs` to read many registers with few commands.
+        Writes queued with :meth:`begin_batch` are sent first under the
+        same lock as batched writes, so batching can be used together with
+        the coroutines.
+
+        Args:
+            reg (str): The name of the register to read.
+            **kwargs: Keyword arguments passed to :meth:`read_reg`.
+
+        Returns:
+            int, list: Parsed response depending on register type.
+        """
+        return await _run_blocking(self.read_reg, reg, **kwargs)
+
+    async def aread_struct(self, struct, **kwargs):
+        """Coroutine version of :meth:`read_struct`.
+
+        Args:
+            struct (str): The name of the struct to read.
+            **kwargs: Keyword arguments passed to :meth:`read_struct`.
+
+        Returns:
+            list: Parsed responses depending on each register type.
+        """
+        return await _run_blocking(self.read_struct, struct, **kwargs)
+
+    def read_regs(self, regs, timeout=None, retry=None):
+        """Read several registers defined by the memory map.
 
+        Registers that are next to each other in memory, or closer than
+        ``max_merge_gap`` bytes, are read with a single device access instead
+        of one access per register.
+
+        Args:
+            regs (list): The names of the registers to read.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+            retry (int): Optional override retry count, defaults to None.
+
+        Returns:
+            dict: Parsed response for each register name.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+            ValueError: Argument incorrect
+        """
+        self.logger.debug("read_regs(regs=%r, "
+                          "timeout=%r, "
+                          "retry=%r)", regs, timeout, retry)
+        spans = []
+        for reg in regs:
+            offset, size = self._reg_span(reg)
+            spans.append((offset, offset + size, reg))
+        spans.sort()
+
+        resps = {}
+        for start, end, run in _merge_spans(spans, self.max_merge_gap):
+            data = self._read_bytes_with_parser(start, end - start, retry,
+                                                timeout)
+            for offset, reg_end, reg in run:
+                resps[reg] = self._parse_reg_data(
+                    self.mem_map[reg], data[offset - start:reg_end - start])
+        return {reg: resps[reg] for reg in regs}
+
+    def _parse_reg_data(self, reg_info, data):
         if reg_info['bits'] != '':
-            data = self._parse_resp_bit(reg_info, data)
-        else:
-            data = self._parse_resp_reg(reg_info, data)
-        return data
+            return self._parse_resp_bit(reg_info, data)
+        return self._parse_resp_reg(reg_info, data)
 
     def _get_off_size_regs(self, regs):
         self.logger.debug("_get_off_size_regs(regs=%r)", regs)
@@ -540,22 +571,23 @@ class MmIf:
         resps = []
         last_offset = -1
         data = None
+        pos = 0
         for reg in regs:
 
             reg_info = self.mem_map[reg]
-            offset, reg_size = self._get_off_size_reg(reg_info, 0, None)
+            offset, reg_size = self._reg_span(reg)
 
-            # In order to not remove data when bitfields are used we make
-            # sure the offset does not change when popping new data
+            # In order to not skip data when bitfields are used we make
+            # sure the offset does not change when taking new data
             if offset != last_offset:
-                data = [rdata.pop(0) for idx in range(reg_size)]
+                data = rdata[pos:pos + reg_size]
+                pos += reg_size
+                if pos > len(rdata):
+                    raise IndexError(f"Not enough data for {reg}")
             last_offset = offset
             if reg.endswith('.res'):
                 continue
-            if reg_info['bits'] != '':
-                result = self._parse_resp_bit(reg_info, data)
-            else:
-                result = self._parse_resp_reg(reg_info, data)
+            result = self._parse_reg_data(reg_info, data)
             if data_has_name:
                 resps.append({reg: result})
             else:
@@ -589,40 +621,85 @@ class MmIf:
                           "data_has_name=%r, "
                           "timeout=%r, "
                           "retry=%r)", struct, data_has_name, timeout, retry)
-        started = False
-        regs = []
-        # We want to collect all names starting with the cmd_start
-        if struct == '.':
-            regs = list(self.mem_map.keys())
+        regs, offset, size = self._struct_plan(struct)
+        if self.max_read_gap is None:
+            data = self._read_bytes_with_parser(offset, size, retry, timeout)
         else:
-            for name in self.mem_map.keys():
-                if name.startswith(struct):
-                    regs.append(name)
-                    started = True
-                elif started is True:
-                    # If there is a break in the list we should exit out
-                    # otherwise the data will not be grouped.
-                    break
-        offset, size = self._get_off_size_regs(regs)
-        data = self._read_bytes_with_parser(offset, size, retry, timeout)
+            data = [0] * size
+            for start, end in self._struct_read_ranges(regs):
+                data[start - offset:end - offset] = \
+                    self._read_bytes_with_parser(start, end - start, retry,
+                                                 timeout)
         data = self._parse_read_struct(regs, data, data_has_name)
         return data
 
+    def _struct_plan(self, struct):
+        """Return the registers of a struct with the offset and size to read.
+
+        The result is kept for each struct name until the memory map is
+        replaced.
+        """
+        plan = self._struct_plans.get(struct)
+        if plan is None:
+            regs = self._struct_regs(struct)
+            plan = (regs,) + self._get_off_size_regs(regs)
+            self._struct_plans[struct] = plan
+        return plan
+
+    def _struct_regs(self, struct):
+        """Return the names of the registers of a struct.
+
+        The result is kept for each struct name until the memory map is
+        replaced.
+        """
+        regs = self._struct_regs_cache.get(struct)
+        if regs is not None:
+            return regs
+        if self._name_index is None:
+            names = tuple(self.mem_map)
+            self._name_index = (names, sorted(zip(names, range(len(names)))))
+        names, index = self._name_index
+        if struct == '.':
+            regs = names
+        else:
+            # We want to collect all names starting with the cmd_start,
+            # they are next to each other in the sorted index
+            idx = bisect.bisect_left(index, (struct,))
+            positions = []
+            while idx < len(index) and index[idx][0].startswith(struct):
+                positions.append(index[idx][1])
+                idx += 1
+            positions.sort()
+            # If there is a break in the memory map order we stop,
+            # otherwise the data will not be grouped.
+            run = positions[:1]
+            for pos in positions[1:]:
+                if pos != run[-1] + 1:
+                    break
+                run.append(pos)
+            regs = tuple(names[pos] for pos in run)
+        self._struct_regs_cache[struct] = regs
+        return regs
+
+    def _struct_read_ranges(self, regs):
+        """Return the ``(start, end)`` byte ranges to read for a struct.
+
+        Reserved registers are not read, ranges closer than
+        ``max_read_gap`` bytes are still read together.
+        """
+        spans = []
+        for reg in regs:
+            if not reg.endswith('.res'):
+                offset, size = self._reg_span(reg)
+                spans.append((offset, offset + size))
+        spans.sort()
+        return [(start, end) for start, end, _ in
+                _merge_spans(spans, self.max_read_gap)]
+
     def _write_data_to_bytes(self, reg_info, data):
         self.logger.debug("_write_data_to_bytes(reg_info=%r, "
                           "data=%r)", reg_info, data)
-        signed = False
-        if reg_info['type'].startswith('int'):
-            signed = True
-        wdata = bytearray()
-        if isinstance(data, int):
-            wdata = data.to_bytes(reg_info['type_size'], "little",
-                                  signed=signed)
-        else:
-            for element in data:
-                wdata += element.to_bytes(reg_info['type_size'], "little",
-                                          signed=signed)
-        return list(wdata)
+        return _pack_reg_data(reg_info, data)
 
     def _write_bytes_with_parser(self, data, offset, size, retry, timeout):
         self.logger.debug("_write_bytes_with_parser("
@@ -631,57 +708,116 @@ class MmIf:
                           "size=%r, "
                           "retry=%r, "
                           "timeout=%r, ", data, offset, size, retry, timeout)
+        with self._write_lock:
+            if self._write_queue is not None:
+                self._write_queue.add(offset, data[:size])
+                return
         frag_size = self.frag_size or size
         for byte_cnt in range(0, size, frag_size):
             bytes_to_write = min(size - byte_cnt, frag_size)
             self._retry_func(self.parser.write_bytes,
                              retry,
                              offset + byte_cnt,
-                             data[:bytes_to_write],
+                             data[byte_cnt:byte_cnt + bytes_to_write],
                              timeout=timeout)
-            for _ in range(bytes_to_write):
-                data.pop(0)
-
-    @staticmethod
-    def _parse_write_bit(cmd, w_data, r_data):
-        bits = int(cmd['bits'])
-        offset = int(cmd['bit_offset'])
-        bit_mask = (2 ** bits) - 1
-        if w_data > bit_mask:
-            raise ValueError(f"Writing value outside bitfield"
-                             f" {w_data} !<= {bit_mask}")
-        data = r_data & ~(bit_mask << offset)
-        data = (w_data << offset) | data
-        return list(data.to_bytes(cmd['type_size'], 'little'))
-
-    @staticmethod
-    def _prep_write_data(data):
-        if isinstance(data, list):
-            if len(data) == 1:
-                data = data[0]
-        if isinstance(data, list):
-            elements = []
-            for element in data:
-                elements.append(literal_eval(str(element)))
-            data = elements
-        else:
-            data = literal_eval(str(data))
-        return data
+
+    def _flush_writes(self, retry, timeout):
+        with self._write_lock:
+            if not self._write_queue:
+                return
+            # Writes are sent directly while flushing
+            pending = self._write_queue.fragments(self.frag_size)
+            self._write_queue = None
+            try:
+                if self.frag_depth > 1:
+                    self._write_pending_pipelined(pending, retry, timeout)
+                else:
+                    while pending:
+                        self._retry_func(self.parser.write_bytes, retry,
+                                         *pending[0], timeout=timeout)
+                        del pending[0]
+            finally:
+                # Writes that were not sent stay queued so they are not lost
+                # if sending fails, the next flush sends them again
+                self._write_queue = _WriteQueue(pending)
+
+    def _write_pending_pipelined(self, pending, retry, timeout):
+        # A retry only sends the writes that were not acknowledged
+        self._retry_func(self._write_pending_groups, retry, pending, timeout)
+
+    def _write_pending_groups(self, pending, timeout):
+        while pending:
+            group = pending[:self.frag_depth]
+            acked = []
+            try:
+                self.parser.write_bytes_pipelined(group, timeout=timeout,
+                                                  acked=acked)
+            finally:
+                pending[:len(group)] = self._unacked_writes(group, acked)
+
+    def begin_batch(self):
+        """Queue register writes instead of sending them right away.
+
+        Writes to neighbouring memory are merged and sent with
+        :meth:`commit_batch`, with ``frag_depth`` above 1 the remaining
+        writes are also sent without waiting between them. Any read or
+        commit sends the queued writes first so the device state seen by the
+        caller stays the same. Bitfields and :meth:`write_struct` only read
+        the bytes they change and apply the queued writes to them, the rest
+        stays queued.
+        """
+        self.logger.debug("begin_batch()")
+        with self._write_lock:
+            if self._write_queue is None:
+                self._write_queue = _WriteQueue()
+
+    def commit_batch(self, timeout=None, retry=None):
+        """Send the queued writes and stop queuing.
+
+        If sending fails, the writes that were not sent stay queued and
+        batching stays on. Call :meth:`commit_batch` again to send them or
+        :meth:`discard_batch` to drop them.
+
+        Args:
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+            retry (int): Optional override retry count, defaults to None.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("commit_batch(timeout=%r, retry=%r)",
+                          timeout, retry)
+        with self._write_lock:
+            self._flush_writes(retry, timeout)
+            self._write_queue = None
+
+    def discard_batch(self):
+        """Drop the queued writes without sending them and stop queuing."""
+        self.logger.debug("discard_batch()")
+        with self._write_lock:
+            self._write_queue = None
 
     def _write_formatted_bytes(self, reg_info, data, offset, size, timeout,
                                retry):
-        wb_offset, wb_size = self._get_off_size_reg(reg_info, offset, size)
-        wb_data = self._write_data_to_bytes(reg_info, data)
-        if reg_info['bits'] != '':
-            rb_data = self._read_bytes_with_parser(wb_offset, wb_size, retry,
+        # The bytes of a bitfield must not change between reading and
+        # queuing them
+        with self._write_lock:
+            wb_offset, wb_size = self._get_off_size_reg(reg_info, offset, size)
+            wb_data = self._write_data_to_bytes(reg_info, data)
+            if reg_info['bits'] != '':
+                # Bitfields of a register written in a batch reuse the queued
+                # bytes, so they are read and written once
+                rb_data = self._read_batched_bytes(wb_offset, wb_size, retry,
                                                    timeout)
-            rb_data = int.from_bytes(bytearray(rb_data), 'little')
-            self.logger.debug("_parse_write_bit(reg_info=%r, "
-                              "data=%r, "
-                              "rb_data=%r)", reg_info, data, rb_data)
-            wb_data = self._parse_write_bit(reg_info, data, rb_data)
-        self._write_bytes_with_parser(wb_data, wb_offset, wb_size, retry,
-                                      timeout)
+                rb_data = int.from_bytes(rb_data, 'little')
+                self.logger.debug("_parse_write_bit(reg_info=%r, "
+                                  "data=%r, "
+                                  "rb_data=%r)", reg_info, data, rb_data)
+                wb_data = self._parse_write_bit(reg_info, data, rb_data)
+            self._write_bytes_with_parser(wb_data, wb_offset, wb_size, retry,
+                                          timeout)
 
     def write_reg(self, reg, data, offset=0, verify=False, timeout=None,
                   retry=None):
@@ -735,6 +871,91 @@ class MmIf:
                 raise RuntimeError(f"Verification of written data failed! "
                                    f"wrote {data} but read {v_data}")
 
+    def write_struct(self, struct, values, timeout=None, retry=None):
+        """Write several registers of a struct with one write command.
+
+        The bytes from the first to the last given register are written at
+        once. If bitfields, other registers or array elements that are not
+        given are in that span, it is read first so their values are kept.
+        Nothing is sent if ``values`` is empty.
+
+        Args:
+            struct (str): The name of the struct, as for :meth:`read_struct`.
+            values (dict): Data to write for each register name.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+            retry (int): Optional override retry count, defaults to None.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+            KeyError: Register is not part of the struct
+            ValueError: Argument incorrect
+        """
+        self.logger.debug("write_struct(struct=%r, "
+                          "values=%r, "
+                          "timeout=%r, "
+                          "retry=%r)", struct, values, timeout, retry)
+        regs = self._struct_regs(struct)
+        for reg in values:
+            if reg not in regs:
+                raise KeyError(f"{reg} is not part of {struct}")
+        if not values:
+            return
+        spans = [self._reg_span(reg) for reg in values]
+        start = min(offset for offset, _ in spans)
+        end = max(offset + size for offset, size in spans)
+        patches = {reg: self._reg_patch(reg, data)
+                   for reg, data in values.items()}
+        buf = self._patched_span(start, end, patches, retry, timeout)
+        self._write_bytes_with_parser(buf, start, len(buf), retry, timeout)
+
+    def _patched_span(self, start, end, patches, retry, timeout):
+        """Return the bytes from start to end with the patches applied."""
+        # Bitfields, gaps and array elements that are not given must keep
+        # the values from the device
+        if sum(len(w_data) for _, w_data in patches.values()
+               if w_data is not None) != end - start:
+            buf = bytearray(self._read_batched_bytes(start, end - start,
+                                                     retry, timeout))
+        else:
+            buf = bytearray(end - start)
+        for reg, (data, w_data) in patches.items():
+            offset, size = self._reg_span(reg)
+            pos = offset - start
+            if w_data is None:
+                r_data = int.from_bytes(buf[pos:pos + size], 'little')
+                w_data = self._parse_write_bit(self.mem_map[reg], data,
+                                               r_data)
+            buf[pos:pos + len(w_data)] = w_data
+        return buf
+
+    def _reg_patch(self, reg, data):
+        """Return the prepared data of reg and its bytes, None if bitfield."""
+        reg_info = self.mem_map[reg]
+        data = self._prep_write_data(data)
+        if reg_info['bits'] != '':
+            return data, None
+        w_data = self._write_data_to_bytes(reg_info, data)
+        if len(w_data) > self._reg_span(reg)[1]:
+            raise ValueError(f"Too much data for {reg}, {data}")
+        return data, w_data
+
+    def bind(self, reg):
+        """Return a :class:`BoundReg` for fast repeated access to a register.
+
+        Args:
+            reg (str): The name of the register.
+
+        Returns:
+            BoundReg: The resolved register.
+
+        Exceptions:
+            KeyError: Register not in the memory map
+        """
+        self.logger.debug("bind(reg=%r)", reg)
+        return BoundReg(self, reg)
+
     def commit_write(self, reg, data, offset=0, verify=False, timeout=None,
                      retry=None):
         """Write and commit in one step.
@@ -0,0 +1,378 @@
+# Copyright (c) 2020 HAW Hamburg
+# This file is subject to the terms and conditions of the MIT License. See the
+# file LICENSE in the top level directory for more details.
+# SPDX-License-Identifier:    MIT
+"""Json parser for memory map based devices.
+
+Sends the commands of the memory map protocol through a driver and parses
+the json responses, used by :class:`mm_pal.mm_if.MmIf`.
+"""
+import inspect
+import json
+import logging
+import threading
+from ._mm_utils import _error_text, _loads_obj, _run_blocking, _wr_cmd
+
+
+__author__ = "Kevin Weiss"
+__email__ = "weiss.kevin604@gmail.com"
+
+
+class MmJsonParser:
+    """Json style parser for interfacing to memory map based devices.
+
+    Send command and parse response. Read lines
+    until json information contains a ``result``. Convert result to
+    ``RESULT_*`` type. Add `cmd` element with evaluated call.
+
+    Attributes:
+        driver (obj): Driver to send and receive information to parse.
+        hex_data (bool): Read data strings are hex and converted to bytes.
+
+    Example:
+        send with driver
+        ``rr 0 3``
+
+        receive with driver
+        ``{"data":[0,1,2],"result":0}`` of type ``str``
+
+        return parsed data:
+        ::
+
+            [0, 1, 2]
+    """
+
+    def __init__(self, driver, hex_data=False):
+        """Instantiate parser instance and start logger.
+
+        Args:
+            driver (obj): Driver to send and receive information to parse.
+            hex_data (bool): The device was set up to send read data as a
+                hex string such as ``"0001ff"``, defaults to False. Lists of
+                numbers are still accepted, strings are only converted when
+                this is set.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.logger.debug("__init__(driver=%r, hex_data=%r)", driver,
+                          hex_data)
+        self.driver = driver
+        self.hex_data = hex_data
+        self._decoder = json.JSONDecoder()
+        # (driver, result) of the last _driver_can_pipeline check
+        self._can_pipeline = (None, False)
+        # A command and its response must not interleave with another one
+        self._lock = threading.Lock()
+
+    def _error_msg(self, error_code):
+        self.logger.debug("_error_msg("
+                          "error_code=%r)", error_code)
+        raise IOError(_error_text(error_code))
+
+    def _send_cmd(self, cmd, timeout, end_key='result'):
+        self.logger.debug("_send_cmd("
+                          "cmd=%r, "
+                          "timeout=%r, "
+                          "end_key=%r)", cmd, timeout, end_key)
+        with self._lock:
+            self.driver.writeline(cmd)
+            return self._read_cmd_info(timeout, end_key)
+
+    def _read_cmd_info(self, timeout, end_key='result'):
+        cmd_info = {}
+        buf = ''
+        while end_key not in cmd_info:
+            line = self.driver.readline(timeout)
+            if buf and line.lstrip().startswith('{'):
+                # A new object starts, the pending one was cut off
+                self.logger.warning("JSON parse error: line=%r", buf)
+                buf = ''
+            buf = self._decode_objs(buf + line, cmd_info)
+        return cmd_info
+
+    def _decode_objs(self, buf, cmd_info):
+        """Update cmd_info with the json objects in buf.
+
+        Returns:
+            str: The start of an object that is not complete yet.
+        """
+        while True:
+            buf = buf.lstrip()
+            if not buf:
+                return buf
+            obj, end = None, 0
+            # Only objects are responses, anything else is not decoded
+            if buf[0] == '{':
+                # Usually the buffer is a single whole object, orjson
+                # decodes that fastest if it is installed
+                obj, end = _loads_obj(buf), len(buf)
+                if obj is None:
+                    try:
+                        obj, end = self._decoder.raw_decode(buf)
+                    except json.decoder.JSONDecodeError as exc:
+                        if (exc.pos >= len(buf) or
+                                exc.msg.startswith('Unterminated')):
+                            # Wait for the rest of the object
+                            return buf
+            if obj is not None:
+                cmd_info.update(obj)
+                buf = buf[end:]
+                continue
+            # We want to ignore non-json type messages
+            # this allows us to have debug messages in our command
+            end = buf.find('\n') + 1 or len(buf)
+            self.logger.warning("JSON parse error: line=%r", buf[:end])
+            buf = buf[end:]
+
+    def send_and_parse_cmd(self, cmd, timeout=None):
+        """Return a dictionary with information from the event.
+
+        Args:
+            send_cmd (str): The command to write to the device.
+            to_byte_array (bool): If True and data is bytes leave it as an
+                array, defaults to False.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+        Returns:
+            dict: parsed json data
+        """
+        self.logger.debug("send_and_parse_cmd("
+                          "cmd=%r, "
+                          "timeout=%r)", cmd, timeout)
+        resp = self._send_cmd(cmd, timeout=timeout)
+
+        if resp['result'] == 0:
+            return resp
+        return self._error_msg(resp['result'])
+
+    async def asend_and_parse_cmd(self, cmd, timeout=None):
+        """Coroutine version of :meth:`send_and_parse_cmd`.
+
+        The command runs in the default executor so the event loop is not
+        blocked while waiting for the device. Commands from several tasks
+        are sent one after the other.
+
+        Args:
+            cmd (str): The command to write to the device.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+        Returns:
+            dict: parsed json data
+        """
+        self.logger.debug("asend_and_parse_cmd("
+                          "cmd=%r, "
+                          "timeout=%r)", cmd, timeout)
+        return await _run_blocking(self.send_and_parse_cmd, cmd,
+                                   timeout=timeout)
+
+    def read_bytes(self, index, size=1, timeout=None):
+        """Read bytes from driver and parse the output.
+
+        Send the ``rr <index> <size>`` command to the driver.
+
+        Args:
+            index (int): Index of the memory map register.
+            size (int): Amount of bytes to read, defaults to 1.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Return:
+            list, bytes: bytes from device, ``bytes`` if ``hex_data`` is
+            set and the device sent a hex string.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+            ValueError: ``hex_data`` is set and the data is not hex
+        """
+        self.logger.debug("read_bytes("
+                          "index=%r, "
+                          "size=%r, "
+                          "timeout=%r)", index, size, timeout)
+        resp = self.send_and_parse_cmd((f'rr {index} {size}'), timeout)
+        return self._resp_data(resp)
+
+    def _resp_data(self, resp):
+        """Return the data of a read response.
+
+        With ``hex_data`` a hex string from the device is converted to
+        bytes, other data is returned as it is. The content is never used to
+        guess the format, text such as ``"cafe"`` stays text.
+        """
+        data = resp['data']
+        if self.hex_data and isinstance(data, str):
+            try:
+                return bytes.fromhex(data)
+            except ValueError:
+                raise ValueError(f"Read data is not hex, {data!r}") \
+                    from None
+        return data
+
+    def read_bytes_pipelined(self, spans, timeout=None):
+        """Read several spans of bytes without waiting between commands.
+
+        All ``rr`` commands are sent before the responses are read, the
+        device answers them in order. If the driver ``writeline`` does not
+        accept the ``flush_input`` argument the commands are sent one at a
+        time instead.
+
+        Args:
+            spans (list): ``(index, size)`` of each read.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Return:
+            list: bytes from device of all spans.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("read_bytes_pipelined("
+                          "spans=%r, "
+                          "timeout=%r)", spans, timeout)
+        resps = self._send_cmds_pipelined(
+            [f'rr {index} {size}' for index, size in spans], timeout)
+        data = []
+        for resp in resps:
+            data.extend(self._resp_data(resp))
+        return data
+
+    def write_bytes_pipelined(self, writes, timeout=None, acked=None):
+        """Write several spans of bytes without waiting between commands.
+
+        All ``wr`` commands are sent before the responses are read, see
+        :meth:`read_bytes_pipelined`.
+
+        Args:
+            writes (list): ``(index, data)`` of each write.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+            acked (list): Optional list to append to, True for each write
+                the device acknowledged and False for each it rejected, in
+                order. This is filled in even if an error is raised, writes
+                without a response are left out.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("write_bytes_pipelined("
+                          "writes=%r, "
+                          "timeout=%r)", writes, timeout)
+        resps = []
+        try:
+            self._send_cmds_pipelined(
+                [_wr_cmd(index, data) for index, data in writes],
+                timeout, resps)
+        finally:
+            if acked is not None:
+                acked.extend(resp['result'] == 0 for resp in resps)
+
+    def _driver_can_pipeline(self):
+        """Return True if the driver can keep input for later responses.
+
+        The signature is only inspected once for each driver, the result is
+        kept until :attr:`driver` is replaced.
+        """
+        driver, can_pipeline = self._can_pipeline
+        if driver is self.driver:
+            return can_pipeline
+        try:
+            params = inspect.signature(self.driver.writeline).parameters
+        except (TypeError, ValueError):
+            can_pipeline = False
+        else:
+            can_pipeline = 'flush_input' in params or any(
+                param.kind == param.VAR_KEYWORD for param in params.values())
+        self._can_pipeline = (self.driver, can_pipeline)
+        return can_pipeline
+
+    def _send_cmds_pipelined(self, cmds, timeout, resps=None):
+        if resps is None:
+            resps = []
+        if not self._driver_can_pipeline():
+            self.logger.debug("driver writeline has no flush_input, "
+                              "sending one command at a time")
+            for cmd in cmds:
+                resps.append(self._send_cmd(cmd, timeout))
+                if resps[-1]['result'] != 0:
+                    self._error_msg(resps[-1]['result'])
+            return resps
+        with self._lock:
+            for num, cmd in enumerate(cmds):
+                self.driver.writeline(cmd, flush_input=num == 0)
+            # Read every response before failing so none are left for the
+            # next command
+            for _ in cmds:
+                resps.append(self._read_cmd_info(timeout))
+        for resp in resps:
+            if resp['result'] != 0:
+                self._error_msg(resp['result'])
+        return resps
+
+    def write_bytes(self, index, data, timeout=None):
+        """Write bytes in the register map.
+
+        Args:
+            index (int): Index of the memory map register.
+            data (list, bytes): Data to write, list of bytes.
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("write_bytes(index=%r, "
+                          "data=%r, "
+                          "timeout=%r)", index, data, timeout)
+        self.send_and_parse_cmd(_wr_cmd(index, data),
+                                timeout=timeout)
+
+    def commit(self, timeout=None):
+        """Commit device configuration changes.
+
+        This will cause any changes in configuration to be applied. Call
+        after writing a register.
+
+        Args:
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.send_and_parse_cmd("ex", timeout=timeout)
+
+    def soft_reset(self, timeout=None):
+        """Send command to get the device to reset itself.
+
+        Args:
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("soft_reset(timeout=%r", timeout)
+        self.send_and_parse_cmd("mcu_rst", timeout=timeout)
+
+    def get_version(self, timeout=None):
+        """Get interface version from device.
+
+        Args:
+            timeout (float): Optional override driver timeout for command,
+                defaults to None.
+
+        Returns:
+            str: version string
+
+        Exceptions:
+            IOError: Errno based error from device
+            TimeoutError: Device did not respond
+        """
+        self.logger.debug("get_version(timeout=%r", timeout)
+        resp = self.send_and_parse_cmd("version", timeout=timeout)
+        return resp['version']
@@ -12,7 +12,6 @@ import logging
 import time
 from typing import Dict
 from serial import Serial, PARITY_NONE, SerialException
-from serial.tools import list_ports
 
 
 __author__ = "Kevin Weiss"
@@ -105,6 +104,9 @@ class SerialDriver:
         if len(args) < 2:
             kwargs['baudrate'] = kwargs.pop('baudrate', 115200)
         if len(args) == 0 and 'port' not in kwargs:
+            # Only import the port listing when it is needed, it is slow
+            # pylint: disable=import-outside-toplevel
+            from serial.tools import list_ports
             # get the last listed port
             kwargs['port'] = sorted(list_ports.comports(),
                                     key=lambda x: x[0])[-1][0]
@@ -240,7 +242,9 @@ class SerialDriver:
                 self.close()
                 self._connect(*self._args, **self._kwargs)
             raise TimeoutError("Timeout during serial readline")
-        self.logger.debug("Response: %s", response.replace('\n', ''))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            # Stripping the newline costs a copy for every line read
+            self.logger.debug("Response: %s", response.replace('\n', ''))
         return response
 
     def readlines_to_delim(self, timeout=None, clean_noise=True, delim='>'):
@@ -297,7 +301,7 @@ class SerialDriver:
             raise TimeoutError("Timeout during serial read")
         return res_bytes
 
-    def writeline(self, line):
+    def writeline(self, line, flush_input=True):
         """Write a line.
 
         Line includes a newline, preable, and encode
@@ -305,10 +309,15 @@ class SerialDriver:
 
         Args:
             line (str, list): Bytes to send to the driver.
+            flush_input (bool): Flush the input before writing, disable when
+                responses of earlier lines are still to be read, defaults
+                to True.
         """
-        self.logger.debug("writeline(line=%r)", line)
-        # Clear the input buffer in case it junk data go in creating an offset
-        self.dev.flushInput()
+        self.logger.debug("writeline(line=%r, flush_input=%r)",
+                          line, flush_input)
+        if flush_input:
+            # Clear the input buffer in case junk data creates an offset
+            self.dev.flushInput()
         write_data = f"{self.writeline_preamble}{line}\n".encode('utf-8')
         self.logger.debug("writing: %r", write_data)
         self.dev.write(write_data)
@@ -57,6 +57,7 @@ setup(
     setup_requires=["pytest-runner"],
     tests_require=["pytest", "pytest-cov", "pytest-regtest"],
     install_requires=['pyserial', 'cmd2>=2'],
+    extras_require={'numpy': ['numpy'], 'orjson': ['orjson']},
     entry_points={
         'console_scripts': ['start_mock_dev=mock_pal.mock_dev:main',
                             'mm_pal_mock_cli=mock_pal.mock_cli:main']
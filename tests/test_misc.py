@@ -0,0 +1,109 @@
+"""Tests the serial_connect_wizard of mm_pal.
+
+The serial ports are faked, no hardware or virtual ports are needed.
+"""
+import builtins
+import time
+import pytest
+from serial.tools.list_ports_common import ListPortInfo
+from mm_pal import misc, _list_ports_fast
+
+
+class _FakeComports:
+    def __init__(self, devices):
+        self.devices = devices
+        self.calls = []
+
+    def __call__(self, hardware_info=False):
+        self.calls.append(hardware_info)
+        ports = []
+        for device, vid, pid in self.devices:
+            info = ListPortInfo(device, skip_link_detection=True)
+            info.vid, info.pid = vid, pid
+            ports.append(info)
+        return ports
+
+
+def _fake_ports(monkeypatch, devices):
+    fake = _FakeComports([(dev, None, None) if isinstance(dev, str) else dev
+                          for dev in devices])
+    monkeypatch.setattr(_list_ports_fast, "comports", fake)
+    monkeypatch.setattr(misc, "_PORT_CACHE", {"ts": 0.0, "ports": None,
+                                              "hardware_info": False})
+    return fake
+
+
+def _if_obj(**kwargs):
+    return kwargs
+
+
+@pytest.mark.parametrize("case", [
+    (["/dev/rfcomm0", "/dev/ttyACM0"], "/dev/ttyACM0"),
+    (["/dev/rfcomm12", "/dev/ttyUSB0"], "/dev/ttyUSB0"),
+    (["/dev/cu.Bluetooth-Incoming-Port", "/dev/cu.usbmodem14101"],
+     "/dev/cu.usbmodem14101"),
+    (["/dev/tty.Bluetooth-Incoming-Port", "/dev/tty.usbmodem1421"],
+     "/dev/tty.usbmodem1421"),
+    (["/dev/cu.modem", "/dev/cu.usbserial-A50285BI"],
+     "/dev/cu.usbserial-A50285BI"),
+    (["COM3"], "COM3"),
+])
+def test_wizard_port_filter(monkeypatch, case):
+    devices, expected = case
+    _fake_ports(monkeypatch, devices)
+    assert misc.serial_connect_wizard(_if_obj)["port"] == expected
+
+
+def test_wizard_only_excluded_ports(monkeypatch):
+    _fake_ports(monkeypatch, ["/dev/rfcomm0",
+                              "/dev/cu.Bluetooth-Incoming-Port"])
+    with pytest.raises(ConnectionError):
+        misc.serial_connect_wizard(_if_obj)
+
+
+def test_wizard_custom_port_filter(monkeypatch):
+    _fake_ports(monkeypatch, ["/dev/rfcomm0", "/dev/ttyACM0",
+                              "/dev/ttyUSB0"])
+    resp = misc.serial_connect_wizard(_if_obj, port_filter="rfcomm")
+    assert resp["port"] == "/dev/rfcomm0"
+
+
+def test_wizard_port_skips_enumeration(monkeypatch):
+    fake = _fake_ports(monkeypatch, ["/dev/ttyACM0"])
+    resp = misc.serial_connect_wizard(_if_obj, port="/dev/foo", baud=9600)
+    assert resp == {"port": "/dev/foo", "baud": 9600}
+    assert fake.calls == []
+
+
+def test_wizard_vid_pid_first(monkeypatch, capsys):
+    fake = _fake_ports(monkeypatch, [("/dev/ttyACM0", 0x1234, 0x0001),
+                                     ("/dev/ttyACM1", 0x0483, 0x374b)])
+    monkeypatch.setattr(builtins, "input", lambda prompt: "0")
+    resp = misc.serial_connect_wizard(_if_obj, vid_pid=[(0x0483, 0x374b)])
+    assert resp["port"] == "/dev/ttyACM1"
+    assert fake.calls == [True]
+    assert capsys.readouterr().out.startswith("Select a serial port:\n0: ")
+
+
+def test_cached_comports_ttl(monkeypatch):
+    fake = _fake_ports(monkeypatch, ["/dev/ttyACM1", "/dev/ttyACM0"])
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    ports = misc._cached_comports()
+    assert [port.device for port in ports] == ["/dev/ttyACM0",
+                                               "/dev/ttyACM1"]
+    misc._cached_comports()
+    assert fake.calls == [False]
+    misc._cached_comports(use_cache=False)
+    assert fake.calls == [False, False]
+    now[0] += misc._CACHE_TTL
+    misc._cached_comports()
+    assert fake.calls == [False, False, False]
+
+
+def test_cached_comports_hardware_info(monkeypatch):
+    fake = _fake_ports(monkeypatch, ["/dev/ttyACM0"])
+    misc._cached_comports()
+    misc._cached_comports(hardware_info=True)
+    misc._cached_comports()
+    assert fake.calls == [False, True]
@@ -1,9 +1,16 @@
 """Tests the mm_if of mm_pal."""
+import asyncio
+import inspect
+import struct
+from ast import literal_eval
 from time import sleep
 from serial import Serial
 import pytest
 from conftest import MM_PATH, EXT_PORT
-from mm_pal import MmIf
+from mm_pal import MmIf, import_mm_from_csv
+from mm_pal import _mm_utils
+from mm_pal._write_batch import _WriteQueue
+from mm_pal.mm_if import MmJsonParser
 
 
 def _expect_read_reg(app, inst, reg, data):
@@ -78,6 +85,192 @@ def test_read_reg_fail(mock_app_json, mm_if_inst):
     assert mm_if_inst.read_reg("arru8") == ['f', 'o', 'o']
 
 
+def test_read_regs(mock_app_json, mm_if_inst):
+    regs = ["ui16", "ui8", "bf8.b2", "bf8.b1", "arru16", "stt.arr16"]
+    expected = {reg: mm_if_inst.read_reg(reg) for reg in regs}
+    assert mm_if_inst.read_regs(regs) == expected
+    mm_if_inst.frag_size = 3
+    assert mm_if_inst.read_regs(regs) == expected
+    assert list(mm_if_inst.read_regs(regs)) == regs
+    mm_if_inst.max_merge_gap = 64
+    assert mm_if_inst.read_regs(regs) == expected
+
+
+class _LineDriver:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def writeline(self, line):
+        pass
+
+    def readline(self, timeout=None):
+        return self.lines.pop(0)
+
+
+def test_pipelined_driver_fallback():
+    # _LineDriver.writeline has no flush_input, commands go one at a time
+    parser = MmJsonParser(_LineDriver(['{"data": [1, 2], "result": 0}\n',
+                                       '{"data": [3], "result": 0}\n']))
+    assert parser.read_bytes_pipelined([(0, 2), (2, 1)]) == [1, 2, 3]
+    acked = []
+    parser.driver.lines = ['{"result": 0}\n', '{"result": 22}\n']
+    with pytest.raises(IOError):
+        parser.write_bytes_pipelined([(0, [1]), (1, [2]), (2, [3])],
+                                     acked=acked)
+    assert acked == [True, False]
+
+
+class _PipeDriver(_LineDriver):
+    def writeline(self, line, flush_input=True):
+        pass
+
+
+def test_driver_can_pipeline_cached(monkeypatch):
+    calls = []
+    signature = inspect.signature
+    monkeypatch.setattr(inspect, "signature",
+                        lambda func: calls.append(func) or signature(func))
+    parser = MmJsonParser(_LineDriver([]))
+    assert not parser._driver_can_pipeline()
+    assert not parser._driver_can_pipeline()
+    assert len(calls) == 1
+    # A new driver is checked again
+    parser.driver = _PipeDriver([])
+    assert parser._driver_can_pipeline()
+    assert parser._driver_can_pipeline()
+    assert len(calls) == 2
+
+
+def test_parse_array():
+    data = bytes(range(128))
+    parsed = MmIf._parse_array(data, 2, "int16_t")
+    assert parsed == list(struct.unpack("<64h", data))
+    assert MmIf._parse_array(list(data), 4, "uint32_t") == \
+        list(struct.unpack("<32I", data))
+
+
+def test_parse_array_numpy():
+    pytest.importorskip("numpy")
+    data = bytes(range(256)) * 64
+    assert MmIf._parse_array_numpy(data[:-1], 2, "int16_t") is None
+    parsed = MmIf._parse_array_numpy(data, 2, "int16_t")
+    assert parsed == list(struct.unpack("<8192h", data))
+    assert MmIf._parse_array(list(data), 4, "uint32_t") == \
+        list(struct.unpack("<4096I", data))
+
+
+class _Index:
+    # Integer type that is not an int, like numpy.int64
+    def __init__(self, val):
+        self.val = val
+
+    def __index__(self):
+        return self.val
+
+
+def test_prep_write_data_index():
+    data = MmIf._prep_write_data(_Index(5))
+    assert data == 5 and type(data) is int
+    assert MmIf._prep_write_data([_Index(1), "2"]) == [1, 2]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_parse_split_json(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(_mm_utils, "_optional_module",
+                            lambda name: None)
+    parser = MmJsonParser(_LineDriver(['debug message\n',
+                                       '{"data": [1,\n',
+                                       '2], "result": 0}\n']))
+    assert parser.read_bytes(0, 2) == [1, 2]
+    parser.driver.lines = ['42\n', '{"version": "0.0.1"} {"result": 0}\n']
+    assert parser.get_version() == "0.0.1"
+    # Text that looks like hex is returned as it was sent by default
+    for text in ("cafe", "0123", "01ff", "foo"):
+        parser.driver.lines = [f'{{"data": "{text}", "result": 0}}\n']
+        assert parser.read_bytes(0, 2) == text
+    parser.hex_data = True
+    parser.driver.lines = ['{"data": "01ff", "result": 0}\n']
+    assert parser.read_bytes(0, 2) == b"\x01\xff"
+    parser.driver.lines = ['{"data": "foo", "result": 0}\n']
+    with pytest.raises(ValueError):
+        parser.read_bytes(0, 2)
+    # Devices may still send lists of numbers
+    parser.driver.lines = ['{"data": [1, 255], "result": 0}\n']
+    assert parser.read_bytes(0, 2) == [1, 255]
+    parser.driver.lines = ['{"data":[1,2,\n', '{"data":[1,2],"result":0}\n']
+    assert parser.read_bytes(0, 2) == [1, 2]
+
+
+def test_async_send(mock_app_json, mm_if_inst):
+    async def _get_versions():
+        return await asyncio.gather(
+            *(mm_if_inst.parser.asend_and_parse_cmd("version")
+              for _ in range(3)))
+
+    for resp in asyncio.run(_get_versions()):
+        assert resp["version"] == "0.0.1"
+
+
+def test_async_read(mock_app_json, mm_if_inst):
+    async def _read():
+        return await asyncio.gather(mm_if_inst.aread_reg("arru16"),
+                                    mm_if_inst.aread_struct("stt"))
+
+    assert asyncio.run(_read()) == [mm_if_inst.read_reg("arru16"),
+                                    mm_if_inst.read_struct("stt")]
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("i8", 6)
+    asyncio.run(_read())
+    # The read in the executor sends the queued write first
+    assert mock_app_json.wr_bytes == [6]
+    mm_if_inst.write_reg("i8", 7)
+    mm_if_inst.commit_batch()
+    assert mock_app_json.wr_bytes == [7]
+
+
+def test_write_struct(mock_app_json, mm_if_inst):
+    mm_if_inst.write_struct("stt", {"stt.ui8": 7, "stt.arr16": [1, 2]})
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["stt.ui8"]["offset"]
+    assert mock_app_json.wr_bytes == [7, 1, 0, 2, 0]
+
+    # Array elements that are not given keep their values
+    mm_if_inst.write_struct("stt", {"stt.arr16": [5]})
+    offset = mm_if_inst.mem_map["stt.arr16"]["offset"]
+    assert mock_app_json.wr_index == offset
+    assert mock_app_json.wr_bytes == [5, 0, (offset + 2) & 0xFF,
+                                      (offset + 3) & 0xFF]
+
+    mm_if_inst.write_struct("stt", {"stt.ui8": 7, "stt.bf16.b1": 1})
+    assert len(mock_app_json.wr_bytes) == 7
+    assert mock_app_json.wr_bytes[0] == 7
+
+    with pytest.raises(KeyError):
+        mm_if_inst.write_struct("stt", {"ui8": 1})
+    with pytest.raises(ValueError):
+        mm_if_inst.write_struct("stt", {"stt.arr16": [1, 2, 3]})
+    mock_app_json.wr_index = None
+    mm_if_inst.write_struct("stt", {})
+    assert mock_app_json.wr_index is None
+
+
+def test_bind(mock_app_json, mm_if_inst):
+    reg = mm_if_inst.bind("arru16")
+    assert reg.read() == mm_if_inst.read_reg("arru16")
+    assert reg.read(offset=2, size=3) == \
+        mm_if_inst.read_reg("arru16", offset=2, size=3)
+    mock_app_json.rr_data = -5
+    assert mm_if_inst.bind("i8").read() == -5
+
+    mm_if_inst.bind("i8").write(5)
+    assert mock_app_json.wr_bytes == [5]
+    with pytest.raises(KeyError):
+        mm_if_inst.bind("does_not_exist")
+
+
 def test_version(mock_app_json, mm_if_inst):
     resp = mm_if_inst.get_version()
     assert resp == "0.0.1"
@@ -111,6 +304,15 @@ def test_read_frag(mock_app_json, mm_if_inst):
     assert resp == mm_if_inst.read_reg("arru16")
     assert resps == mm_if_inst.read_struct("stt")
 
+    mm_if_inst.frag_depth = 3
+    assert resp == mm_if_inst.read_reg("arru16")
+    assert resps == mm_if_inst.read_struct("stt")
+    mock_app_json.force_fails = 1
+    with pytest.raises(IOError):
+        mm_if_inst.read_reg("arru16")
+    assert resp == mm_if_inst.read_reg("arru16")
+
+
 def test_write_frag(mock_app_json, mm_if_inst):
     mm_if_inst.frag_size = 2
     mm_if_inst.write_reg("arru8", [0, 1])
@@ -121,12 +323,156 @@ def test_write_frag(mock_app_json, mm_if_inst):
     assert mock_app_json.wr_bytes == [2, 3]
 
 
+def test_write_batch(mock_app_json, mm_if_inst):
+    mm_if_inst.write_reg("ui8", 0)
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 1)
+    mm_if_inst.write_reg("ui16", 0x0302)
+    assert mock_app_json.wr_bytes == [0]
+
+    mm_if_inst.commit_batch()
+    # Neighbouring registers are written with one command
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["ui8"]["offset"]
+    assert mock_app_json.wr_bytes == [1, 2, 3]
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("i8", 4)
+    mm_if_inst.read_reg("i8")
+    # Reads send queued writes first
+    assert mock_app_json.wr_bytes == [4]
+    mm_if_inst.commit_batch()
+
+    mm_if_inst.write_reg("i8", 5)
+    assert mock_app_json.wr_bytes == [5]
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("i8", 8)
+    mm_if_inst.soft_reset()
+    # A reset must not drop the queued writes
+    assert mock_app_json.wr_bytes == [8]
+    mm_if_inst.commit_batch()
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("bf8.b1", 1)
+    mm_if_inst.write_reg("bf8.b2", 3)
+    mm_if_inst.commit_batch()
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["bf8.b1"]["offset"]
+    b1_offset = mm_if_inst.mem_map["bf8.b1"]["bit_offset"]
+    b2_offset = mm_if_inst.mem_map["bf8.b2"]["bit_offset"]
+    assert (mock_app_json.wr_bytes[0] >> b1_offset) & 0x1 == 1
+    assert (mock_app_json.wr_bytes[0] >> b2_offset) & 0x3 == 3
+
+    mm_if_inst.frag_depth = 2
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 6)
+    mm_if_inst.write_reg("i16", 7)
+    mm_if_inst.commit_batch()
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["i16"]["offset"]
+    assert mock_app_json.wr_bytes == [7, 0]
+
+
+def test_write_batch_partial_read(mock_app_json, mm_if_inst):
+    mm_if_inst.write_reg("ui8", 0)
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 9)
+    # Bitfields only read their own bytes, the other writes stay queued
+    mm_if_inst.write_reg("bf8.b1", 1)
+    mm_if_inst.write_reg("stt.arr16", [1, 2])
+    mm_if_inst.write_struct("stt", {"stt.ui8": 7, "stt.bf16.b1": 1})
+    assert mock_app_json.wr_bytes == [0]
+
+    mm_if_inst.commit_batch()
+    # The read span of the struct has the queued array applied
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["stt.ui8"]["offset"]
+    assert mock_app_json.wr_bytes[:5] == [7, 1, 0, 2, 0]
+    mock_app_json.rr_data = 3
+    assert mm_if_inst.read_reg("i8") == 3
+
+
+@pytest.mark.parametrize("frag_depth", [1, 2])
+def test_write_batch_fail(mock_app_json, mm_if_inst, frag_depth):
+    mm_if_inst.frag_depth = frag_depth
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 1)
+    mm_if_inst.write_reg("i16", 2)
+    mock_app_json.wr_bytes = None
+    mock_app_json.force_write_fail = 1
+    with pytest.raises(IOError):
+        mm_if_inst.commit_batch()
+    # The writes that failed stay queued until the batch is committed
+    mm_if_inst.write_reg("i8", 3)
+    assert mock_app_json.wr_index != mm_if_inst.mem_map["i8"]["offset"]
+    mm_if_inst.commit_batch()
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["i8"]["offset"]
+    assert mock_app_json.wr_bytes == [3]
+    mock_app_json.rr_data = 2
+    assert mm_if_inst.read_reg("i16") == 2
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 4)
+    mm_if_inst.discard_batch()
+    mm_if_inst.write_reg("i8", 5)
+    assert mock_app_json.wr_bytes == [5]
+
+
+def test_write_batch_pipelined_acked(mock_app_json, mm_if_inst):
+    mm_if_inst.frag_depth = 2
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 1)
+    mm_if_inst.write_reg("i16", 2)
+    mock_app_json.force_write_fail = 1
+    mm_if_inst.commit_batch(retry=1)
+    # Only the rejected write is sent again
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["ui8"]["offset"]
+    assert mock_app_json.wr_bytes == [1]
+
+    mm_if_inst.begin_batch()
+    mm_if_inst.write_reg("ui8", 3)
+    mm_if_inst.write_reg("i16", 4)
+    mock_app_json.force_write_fail = 1
+    with pytest.raises(IOError):
+        mm_if_inst.commit_batch()
+    mock_app_json.wr_index = None
+    mm_if_inst.commit_batch()
+    assert mock_app_json.wr_index == mm_if_inst.mem_map["ui8"]["offset"]
+    assert mock_app_json.wr_bytes == [3]
+
+
+def test_unacked_writes():
+    group = [(0, b"\x01\x02"), (1, b"\x03"), (4, b"\x04")]
+    assert MmIf._unacked_writes(group, [True, True, True]) == []
+    assert MmIf._unacked_writes(group, [False, True, True]) == group[:2]
+    assert MmIf._unacked_writes(group, [True]) == group[1:]
+
+
+def test_write_queue_overlay():
+    queue = _WriteQueue([(0, b"\x01\x02"), (3, b"\x03\x04\x05")])
+    assert queue.overlay(1, [0, 0, 0, 0]) == bytearray([2, 0, 3, 4])
+    assert queue.overlay(8, b"\x00") == bytearray(1)
+
+
+def test_read_struct_gap(mock_app_json, mm_if_inst):
+    mem_map = {}
+    for name, reg in mm_if_inst.mem_map.items():
+        mem_map["arru32.res" if name == "arru32" else name] = reg
+    mm_if_inst.mem_map = mem_map
+    resps = mm_if_inst.read_struct(".")
+    mm_if_inst.max_read_gap = 16
+    assert resps == mm_if_inst.read_struct(".")
+
+
 def test_read_struct_fail(mock_app_json, mm_if_inst):
     with pytest.raises(IndexError):
         mm_if_inst.read_struct("does_not_exist")
     mock_app_json.force_fails = 1
     with pytest.raises(IOError):
         assert mm_if_inst.read_struct("stt")
+    # Cached struct layouts are dropped with the memory map
+    mm_if_inst.mem_map = {name: reg for name, reg in
+                          mm_if_inst.mem_map.items()
+                          if not name.startswith("stt")}
+    with pytest.raises(IndexError):
+        mm_if_inst.read_struct("stt")
 
 
 def test_write_reg(mock_app_json, mm_if_inst):
@@ -270,6 +616,27 @@ def test_copy_driver(mock_app_json):
     mmif.driver.close()
 
 
+def test_import_mm_from_csv_cache():
+    mem_map = import_mm_from_csv(MM_PATH)
+    mem_map["i8"]["offset"] = -1
+    del mem_map["ui8"]
+    mem_map_copy = import_mm_from_csv(MM_PATH)
+    assert mem_map_copy["i8"]["offset"] != -1
+    assert "ui8" in mem_map_copy
+
+
+@pytest.mark.parametrize("val", ["0", "-12", "0x1f", "010", "1.5", "1e3",
+                                 ".5", "5j", "uint8_t", "", "\"abc\"",
+                                 "[1, 2]", "(1,)", "{'a': 1}", "True",
+                                 "None", "some text", "1.2.3"])
+def test_parse_csv_value(val):
+    try:
+        expected = literal_eval(val)
+    except (ValueError, SyntaxError):
+        expected = val
+    assert _mm_utils._parse_csv_value(val) == expected
+
+
 def test_init_fail(mock_app_json):
     with pytest.raises(NotImplementedError):
         mmif = MmIf(port=EXT_PORT, driver_type='foo')
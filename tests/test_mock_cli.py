@@ -18,7 +18,11 @@ def test_init(mock_app_json, capsys, kwargs):
                                  "write_reg i8 1",
                                  "commit_write i8 1",
                                  "read_struct stt",
+                                 "read_regs ui8 i8",
                                  "commit",
+                                 "begin_batch",
+                                 "commit_batch",
+                                 "discard_batch",
                                  "soft_reset",
                                  "get_version",
                                  "info_reg arru8",
@@ -38,3 +42,24 @@ def test_completion(mock_app_json):
     cli = MockCli(port=EXT_PORT)
     assert "arru8" in cli.regs_choices_method()
     assert "name" in cli.param_choices_method()
+    assert cli._complete_map("arru", "", 0, 0) == ["arru16", "arru32", "arru8"]
+    assert "bf8.res" not in cli._complete_map("bf8", "", 0, 0)
+    assert cli._complete_struct("st", "", 0, 0) == ["stt"]
+    assert cli._complete_struct("stt.", "", 0, 0) == ["stt.arr16",
+                                                      "stt.bf16",
+                                                      "stt.ui8"]
+    assert cli._complete_struct("stt.bf16.b", "", 0, 0) == ["stt.bf16.b1",
+                                                            "stt.bf16.b6",
+                                                            "stt.bf16.b9"]
+
+
+def test_completion_cache(mock_app_json):
+    cli = MockCli(port=EXT_PORT)
+    assert "arru8" in cli.regs_choices_method()
+    cli.dev_driver.mem_map = {"foo": {"bar": 1}}
+    assert cli.regs_choices_method() == ("foo",)
+    assert cli.param_choices_method() == ("bar",)
+    cli.dev_driver.mem_map["baz"] = {"bar": 2}
+    assert cli.regs_choices_method() == ("foo",)
+    cli.invalidate_choices_cache()
+    assert cli.regs_choices_method() == ("foo", "baz")